@@ -0,0 +1,126 @@
+"""Times importing the engine, the batch CLI and the Streamlit app in fresh interpreters.
+
+paypy_core must stay cheap to import: short-lived batch and cron runs load
+it before reading any roster, and pandas, numpy, pyarrow and Streamlit are
+only loaded when they are used (see paypy_lazy). Each module is imported
+--repeat times in a new interpreter and the best time is kept.
+
+    python benchmarks/bench_import.py --output benchmarks/import_baseline.json
+    python benchmarks/bench_import.py --baseline benchmarks/import_baseline.json
+
+The exit status is 1 if:
+- paypy_core or paypy_batch imports one of the heavy modules eagerly;
+- paypy_core takes more than --max-core-fraction of the app's import time;
+- an import is slower than the baseline by more than --tolerance (and by
+  more than --min-seconds).
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+from datetime import datetime, timezone
+
+REPO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+MODULES = ["paypy_core", "paypy_batch", "paypy"]
+
+# Modules that must not be loaded just by importing the given module
+HEAVY_MODULES = ["streamlit", "pandas", "numpy", "pyarrow"]
+LIGHT_MODULES = ["paypy_core", "paypy_batch"]
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "loaded": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def time_import(module, repeat):
+    """Returns {"seconds", "loaded"}: the best import time over fresh interpreters and the heavy modules it loaded"""
+    best = None
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+            cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        if best is None or result["seconds"] < best["seconds"]:
+            best = result
+    best["seconds"] = round(best["seconds"], 6)
+    return best
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark module import times.")
+    parser.add_argument("--modules", nargs="+", default=MODULES, help="Modules to import (default: %(default)s)")
+    parser.add_argument("--repeat", type=int, default=5, help="Fresh interpreters per module; the best is kept")
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="Compare against results saved with --output")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.5, help="Allowed slowdown against the baseline (default: 0.5 = 50%%)"
+    )
+    parser.add_argument(
+        "--min-seconds", type=float, default=0.02, help="Ignore slowdowns smaller than this many seconds"
+    )
+    parser.add_argument(
+        "--max-core-fraction", type=float, default=0.25,
+        help="Largest allowed paypy_core import time as a fraction of paypy's (default: 0.25)"
+    )
+    args = parser.parse_args(argv)
+
+    results = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+        },
+        "repeat": args.repeat,
+        "modules": {},
+    }
+    failures = []
+    for module in args.modules:
+        result = results["modules"][module] = time_import(module, args.repeat)
+        loaded = f"  loads {', '.join(result['loaded'])}" if result["loaded"] else ""
+        print(f"{module:<14} {result['seconds']:8.4f}s{loaded}", file=sys.stderr)
+        if module in LIGHT_MODULES and result["loaded"]:
+            failures.append(f"{module} imports {', '.join(result['loaded'])} eagerly")
+
+    modules = results["modules"]
+    if "paypy_core" in modules and "paypy" in modules:
+        fraction = modules["paypy_core"]["seconds"] / modules["paypy"]["seconds"]
+        print(f"paypy_core loads in {fraction:.1%} of the app's import time", file=sys.stderr)
+        if fraction > args.max_core_fraction:
+            failures.append(f"paypy_core takes {fraction:.0%} of the app's import time (limit {args.max_core_fraction:.0%})")
+
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        for module, result in modules.items():
+            before = baseline.get("modules", {}).get(module)
+            if before is None:
+                continue
+            ratio = result["seconds"] / before["seconds"] if before["seconds"] else float("inf")
+            print(f"{module:<14} baseline {before['seconds']:8.4f}s  current {result['seconds']:8.4f}s  x{ratio:.2f}")
+            if ratio > 1 + args.tolerance and result["seconds"] - before["seconds"] > args.min_seconds:
+                failures.append(f"{module} imports {ratio:.2f}x slower than the baseline")
+
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
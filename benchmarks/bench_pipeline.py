@@ -0,0 +1,234 @@
+"""Times and memory-profiles each stage of the calculator pipeline on synthetic rosters.
+
+Stages: parse (read the roster), validate (coerce and check it chunk by
+chunk, as streaming does), filter (qualifying sections), dedup (merge
+repeated sections), classify (base students and overload), aggregate (pay
+and totals), csv_export and html_export. Each stage is timed on its own
+(best of --repeat runs) and then run once more under tracemalloc for its
+peak allocation.
+
+Results are written as JSON and can be compared against a stored baseline:
+
+    python benchmarks/bench_pipeline.py --sizes 1000 100000 --output benchmarks/baseline.json
+    python benchmarks/bench_pipeline.py --sizes 1000 100000 --baseline benchmarks/baseline.json
+
+The exit status is 1 if any stage is slower than the baseline by more than
+--tolerance (and by more than --min-seconds, to ignore timer noise).
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from paypy_core import (
+    REQUIRED_COLUMNS,
+    ROSTER_COLUMNS,
+    STREAMING_CHUNK_ROWS,
+    OverloadPayCalculator,
+    compact_rows,
+    read_roster,
+)
+from paypy_dedup import DEDUP_POLICIES, dedup_sections
+from paypy_validation import RosterValidator
+from roster_generator import write_roster
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+STAGES = ["parse", "validate", "filter", "dedup", "classify", "aggregate", "csv_export", "html_export"]
+
+
+class _DiscardStream:
+    """Text stream that counts and drops what is written, so exports are measured without their output"""
+
+    def __init__(self):
+        self.chars = 0
+
+    def write(self, text):
+        self.chars += len(text)
+        return len(text)
+
+
+def _pipeline(path, calculator, chunksize, dedup_policy):
+    """Returns (stage, function) pairs; each function feeds the next through the state dict"""
+    state = {}
+
+    def parse():
+        state["roster"] = read_roster(path, columns=ROSTER_COLUMNS)
+
+    def validate():
+        # One validator across the chunks, as in a streamed run, so per-chunk costs that grow show up here
+        roster = state["roster"]
+        validator = RosterValidator(REQUIRED_COLUMNS, duplicate_mask=calculator.course_mask)
+        state["valid"] = pd.concat(
+            [validator.validate(roster.iloc[start:start + chunksize]) for start in range(0, len(roster), chunksize)],
+            ignore_index=True
+        )
+
+    def filter_sections():
+        roster = state["valid"]
+        state["sections"] = calculator.section_rows(roster[calculator.course_mask(roster)])
+
+    def dedup():
+        state["deduped"], _ = dedup_sections(state["sections"], dedup_policy)
+
+    def classify():
+        state["courses"] = compact_rows(calculator.classify_courses(state["deduped"]).sort_values("Staff Name"))
+
+    def aggregate():
+        courses = state["courses"]
+        calculator.processed_df = courses.assign(**{
+            "Overload Pay Cents": calculator.overload_pay_cents(courses["Total Overload"])
+        })
+        calculator.staff_totals, calculator.grand_total = calculator.calculate_totals(calculator.processed_df)
+
+    def csv_export():
+        calculator.write_csv_report(_DiscardStream())
+
+    def html_export():
+        calculator.write_html_report(_DiscardStream())
+
+    return list(zip(STAGES, [parse, validate, filter_sections, dedup, classify, aggregate, csv_export, html_export]))
+
+
+def run_size(path, num_rows, repeat, weeks=4, pay_rate=1.25, chunksize=STREAMING_CHUNK_ROWS, dedup_policy="max"):
+    """Runs every stage on one roster file and returns {stage: {"seconds", "peak_bytes"}}"""
+    calculator = OverloadPayCalculator()
+    calculator.school_name = "Benchmark"
+    calculator.num_weeks = weeks
+    calculator.pay_rate = pay_rate
+
+    results = {}
+    for stage, run in _pipeline(path, calculator, chunksize, dedup_policy):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            run()
+            _, peak_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        results[stage] = {"seconds": round(min(timings), 6), "peak_bytes": peak_bytes}
+        print(
+            f"{num_rows:>10,} rows  {stage:<12} {min(timings):9.4f}s  {peak_bytes / 2 ** 20:9.1f} MiB peak",
+            file=sys.stderr
+        )
+    results["courses"] = len(calculator.processed_df)
+    return results
+
+
+def compare(results, baseline, tolerance, min_seconds):
+    """Returns a comparison table of stage timings and peaks against a baseline, and the regressed rows"""
+    rows = []
+    for size, stages in results["sizes"].items():
+        for stage in STAGES:
+            before = baseline.get("sizes", {}).get(size, {}).get(stage)
+            if before is None:
+                continue
+            after = stages[stage]
+            ratio = after["seconds"] / before["seconds"] if before["seconds"] else np.inf
+            rows.append({
+                "Rows": int(size),
+                "Stage": stage,
+                "Baseline s": before["seconds"],
+                "Current s": after["seconds"],
+                "Ratio": round(ratio, 2),
+                "Baseline MiB": round(before["peak_bytes"] / 2 ** 20, 1),
+                "Current MiB": round(after["peak_bytes"] / 2 ** 20, 1),
+                "Regressed": bool(
+                    ratio > 1 + tolerance and after["seconds"] - before["seconds"] > min_seconds
+                ),
+            })
+    table = pd.DataFrame(rows)
+    regressed = table[table["Regressed"]] if not table.empty else table
+    return table, regressed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the overload pay pipeline stage by stage.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Roster sizes in rows")
+    parser.add_argument("--seed", type=int, default=0, help="Roster generator seed (default: 0)")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per stage; the best is kept")
+    parser.add_argument(
+        "--chunksize", type=int, default=STREAMING_CHUNK_ROWS,
+        help="Rows per chunk in the validate stage (default: the streaming chunk size, %(default)s)"
+    )
+    parser.add_argument(
+        "--dedup", choices=sorted(DEDUP_POLICIES), default="max", help="De-duplication policy for the dedup stage"
+    )
+    parser.add_argument(
+        "--data-dir", default=None,
+        help="Keep generated rosters here and reuse them on later runs (default: a temporary directory)"
+    )
+    parser.add_argument("--output", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--baseline", default=None, help="Compare against results saved with --output")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed slowdown against the baseline (default: 0.2 = 20%%)"
+    )
+    parser.add_argument(
+        "--min-seconds", type=float, default=0.01, help="Ignore slowdowns smaller than this many seconds"
+    )
+    args = parser.parse_args(argv)
+
+    results = {
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "environment": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "platform": platform.platform(),
+        },
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "sizes": {},
+    }
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        data_dir = args.data_dir or temp_dir
+        os.makedirs(data_dir, exist_ok=True)
+        for num_rows in args.sizes:
+            path = os.path.join(data_dir, f"roster_{num_rows}_{args.seed}.csv")
+            if not os.path.exists(path):
+                write_roster(path, num_rows, args.seed)
+            results["sizes"][str(num_rows)] = run_size(
+                path, num_rows, args.repeat, chunksize=args.chunksize, dedup_policy=args.dedup
+            )
+
+    if args.output:
+        directory = os.path.dirname(args.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        table, regressed = compare(results, baseline, args.tolerance, args.min_seconds)
+        if table.empty:
+            print("No sizes in common with the baseline", file=sys.stderr)
+            return 0
+        print(table.to_string(index=False))
+        if not regressed.empty:
+            print(f"{len(regressed)} stage(s) slower than the baseline by more than {args.tolerance:.0%}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,52 @@
+"""Times OverloadPayCalculator.process_data against the original row-by-row loop on synthetic rosters.
+
+The row-by-row baseline (reference_calculator.py) takes about 20 seconds at
+1,000,000 rows; --engine-only skips it.
+
+Usage: python benchmarks/bench_process_data.py [rows ...] [--engine-only]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from paypy_core import OverloadPayCalculator
+from reference_calculator import process_csv
+from roster_generator import make_roster_csv
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+WEEKS = 4
+PAY_RATE = 1.25
+
+
+def main(sizes, engine_only=False):
+    for num_rows in sizes:
+        csv_text = make_roster_csv(num_rows)
+        calculator = OverloadPayCalculator()
+        start = time.perf_counter()
+        success, message = calculator.process_data(io.StringIO(csv_text), "Benchmark", WEEKS, PAY_RATE, False)
+        elapsed = time.perf_counter() - start
+        if not success:
+            raise SystemExit(message)
+        line = f"{num_rows:>10,} rows  engine {elapsed:8.3f}s  ({len(calculator.processed_df):,} courses priced)"
+
+        if not engine_only:
+            start = time.perf_counter()
+            _, staff_totals = process_csv(io.StringIO(csv_text), WEEKS, PAY_RATE)
+            reference_elapsed = time.perf_counter() - start
+            if round(staff_totals["Overload Pay"].sum() * 100) != calculator.grand_total["overload_pay_cents"]:
+                raise SystemExit(f"{num_rows:,} rows: the engine and the row-by-row loop disagree on total pay")
+            line += f"  row-by-row {reference_elapsed:8.3f}s  speedup x{reference_elapsed / elapsed:.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("sizes", nargs="*", type=int, default=DEFAULT_SIZES, help="Roster sizes in rows")
+    parser.add_argument("--engine-only", action="store_true", help="Skip the row-by-row baseline")
+    args = parser.parse_args()
+    main(args.sizes, args.engine_only)
@@ -0,0 +1,45 @@
+"""Times a what-if scenario grid against one process_data run on synthetic rosters.
+
+Usage: python benchmarks/bench_scenarios.py [rows ...]
+"""
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from paypy_core import OverloadPayCalculator
+from paypy_scenarios import ScenarioGrid
+from roster_generator import make_roster_csv
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+
+# 5 pay rates x 4 numbers of weeks x 5 threshold sets = 100 scenarios
+PAY_RATES = [1.00, 1.25, 1.50, 1.75, 2.00]
+NUM_WEEKS = [4, 9, 18, 36]
+THRESHOLD_OFFSETS = [-2, -1, 0, 1, 2]
+
+
+def main(sizes):
+    for num_rows in sizes:
+        csv_text = make_roster_csv(num_rows)
+        calculator = OverloadPayCalculator()
+        start = time.perf_counter()
+        success, message = calculator.process_data(io.StringIO(csv_text), "Benchmark", 4, 1.25, False)
+        run_seconds = time.perf_counter() - start
+        if not success:
+            raise SystemExit(message)
+
+        grid = ScenarioGrid.with_offsets(calculator.rules, PAY_RATES, NUM_WEEKS, THRESHOLD_OFFSETS)
+        start = time.perf_counter()
+        grid.evaluate(calculator)
+        grid_seconds = time.perf_counter() - start
+        print(
+            f"{num_rows:>10,} rows  one run {run_seconds:8.3f}s  {len(grid)} scenarios {grid_seconds:8.3f}s  "
+            f"(x{grid_seconds / run_seconds:.2f} of one run)"
+        )
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or DEFAULT_SIZES)
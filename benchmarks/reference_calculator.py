@@ -0,0 +1,46 @@
+"""The original row-by-row overload pay calculation, kept as a baseline.
+
+This is the loop process_data ran before it was vectorized: every
+qualifying row is classified and priced in Python with iterrows(). The
+parity tests compare the engine against it, and bench_process_data.py
+times it alongside the engine.
+"""
+import pandas as pd
+
+
+def process_rows(roster, num_weeks, pay_rate):
+    """Prices a roster one row at a time, returning (processed rows, staff totals)"""
+    course_mask = (
+        roster["Course Title"].str.contains("MUSIC|PHYS ED|ART|CREATIVE", case=False, na=False) &
+        (roster["Total Students"] > 0)
+    )
+    rows = []
+    for _, row in roster[course_mask].iterrows():
+        course_title = str(row["Course Title"]).upper()
+        if "MIXED" in course_title or " 1" in course_title or " 2" in course_title or " 3" in course_title:
+            base_students = 23
+        elif " 4" in course_title or " 5" in course_title:
+            base_students = 26
+        elif "KINDER" in course_title or " K" in course_title:
+            base_students = 22
+        else:
+            base_students = 23
+        total_overload = max(0, row["Total Students"] - base_students)
+        rows.append({
+            "Year": row.get("Year", ""),
+            "Organization": row.get("Organization", ""),
+            "Course Title": row["Course Title"],
+            "Staff Name": row["Staff Name"],
+            "Total Students": row["Total Students"],
+            "Base Students": base_students,
+            "Total Overload": total_overload,
+            "Overload Pay": round(total_overload * pay_rate * num_weeks, 2),
+        })
+    processed = pd.DataFrame(rows).sort_values("Staff Name")
+    staff_totals = processed.groupby("Staff Name").agg({"Total Overload": "sum", "Overload Pay": "sum"}).reset_index()
+    return processed, staff_totals
+
+
+def process_csv(file, num_weeks, pay_rate):
+    """Reads a roster CSV and prices it like the original process_data"""
+    return process_rows(pd.read_csv(file), num_weeks, pay_rate)
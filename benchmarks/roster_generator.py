@@ -0,0 +1,163 @@
+"""Deterministic synthetic rosters for the benchmarks.
+
+Rosters look like a district export: staff belong to one school, specialists
+teach mostly MUSIC/PHYS ED/ART sections across grade levels (KINDER, K,
+1-5, MIXED) while classroom teachers teach mostly non-qualifying subjects,
+section loads are skewed, and class sizes cluster around the base-student
+thresholds. The same (num_rows, seed) always produces the same roster,
+whatever the chunk size.
+
+Usage: python benchmarks/roster_generator.py 1000000 roster.csv [--seed 0]
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+
+QUALIFYING_SUBJECTS = ["MUSIC", "GENERAL MUSIC", "PHYS ED", "ART", "CREATIVE ARTS"]
+OTHER_SUBJECTS = ["MATH", "READING", "SCIENCE", "SOCIAL STUDIES", "WRITING", "HOMEROOM"]
+SUBJECTS = QUALIFYING_SUBJECTS + OTHER_SUBJECTS
+
+# Grade level suffixes and how often they appear
+GRADE_LEVELS = [" KINDER", " K", " 1", " 2", " 3", " 4", " 5", " MIXED", ""]
+GRADE_WEIGHTS = [0.08, 0.07, 0.14, 0.14, 0.14, 0.14, 0.14, 0.10, 0.05]
+
+# Mean class size per grade level; real sections sit close to the thresholds
+GRADE_CLASS_SIZES = [21, 21, 22, 23, 23, 25, 26, 22, 24]
+
+FIRST_NAMES = [
+    "Alex", "Maria", "James", "Linda", "Robert", "Patricia", "Michael", "Jennifer", "David", "Elizabeth",
+    "Daniel", "Susan", "Kevin", "Karen", "Brian", "Nancy", "Jose", "Lisa", "Thomas", "Angela",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Hernandez", "Lopez", "Gonzalez", "Wilson", "Anderson", "Thomas", "Taylor", "Moore", "Jackson", "Martin",
+]
+SCHOOL_NAMES = [
+    "Lincoln", "Adams", "Kennedy", "Washington", "Jefferson", "Roosevelt", "Madison", "Franklin",
+    "Hamilton", "Jackson", "Monroe", "Grant", "Wilson", "Harding", "Truman", "Hoover",
+]
+
+# Average sections per staff member and share of staff who are specialists
+SECTIONS_PER_STAFF = 25
+SPECIALIST_SHARE = 0.3
+
+# Share of a staff member's sections outside their main subject, and of cancelled (empty) sections
+OFF_SUBJECT_SHARE = 0.1
+EMPTY_SECTION_SHARE = 0.03
+
+DEFAULT_CHUNK_ROWS = 500_000
+
+
+def _staff_pool(num_rows, seed):
+    """Builds the staff list: names, schools, main subjects and skewed section loads"""
+    rng = np.random.default_rng([seed, 0])
+    num_staff = max(5, num_rows // SECTIONS_PER_STAFF)
+    num_schools = max(1, num_staff // 40)
+
+    names = []
+    for index in range(num_staff):
+        first = FIRST_NAMES[index % len(FIRST_NAMES)]
+        last = LAST_NAMES[(index // len(FIRST_NAMES)) % len(LAST_NAMES)]
+        cycle = index // (len(FIRST_NAMES) * len(LAST_NAMES))
+        names.append(f"{last}, {first}" + (f" {cycle + 1}" if cycle else ""))
+
+    schools = [
+        f"{SCHOOL_NAMES[index % len(SCHOOL_NAMES)]} Elementary"
+        + (f" {index // len(SCHOOL_NAMES) + 1}" if index >= len(SCHOOL_NAMES) else "")
+        for index in range(num_schools)
+    ]
+
+    specialist = rng.random(num_staff) < SPECIALIST_SHARE
+    main_subject = np.where(
+        specialist,
+        rng.integers(0, len(QUALIFYING_SUBJECTS), num_staff),
+        len(QUALIFYING_SUBJECTS) + rng.integers(0, len(OTHER_SUBJECTS), num_staff)
+    )
+    load = rng.lognormal(0.0, 0.6, num_staff)
+    return {
+        "names": np.array(names, dtype=object),
+        "schools": np.array(schools, dtype=object)[rng.integers(0, num_schools, num_staff)],
+        "main_subject": main_subject,
+        "load": load / load.sum(),
+    }
+
+
+def _roster_chunk(staff, num_rows, seed, chunk_index):
+    """Generates one chunk of roster rows from its own seeded stream"""
+    rng = np.random.default_rng([seed, chunk_index + 1])
+    titles = np.array([f"{subject}{level}" for subject in SUBJECTS for level in GRADE_LEVELS], dtype=object)
+
+    staff_index = rng.choice(len(staff["names"]), num_rows, p=staff["load"])
+    subject = staff["main_subject"][staff_index]
+    off_subject = rng.random(num_rows) < OFF_SUBJECT_SHARE
+    subject[off_subject] = rng.integers(0, len(SUBJECTS), int(off_subject.sum()))
+    grade = rng.choice(len(GRADE_LEVELS), num_rows, p=GRADE_WEIGHTS)
+
+    class_size = np.rint(rng.normal(np.array(GRADE_CLASS_SIZES)[grade], 4.0)).clip(1, 40).astype(np.int64)
+    class_size[rng.random(num_rows) < EMPTY_SECTION_SHARE] = 0
+
+    return pd.DataFrame({
+        "Year": 2025,
+        "Organization": staff["schools"][staff_index],
+        "Course Title": titles[subject * len(GRADE_LEVELS) + grade],
+        "Staff Name": staff["names"][staff_index],
+        "Total Students": class_size,
+    })
+
+
+def iter_roster_chunks(num_rows, seed=0, chunk_rows=DEFAULT_CHUNK_ROWS):
+    """Yields the roster in DataFrame chunks of up to chunk_rows rows"""
+    staff = _staff_pool(num_rows, seed)
+    for chunk_index, start in enumerate(range(0, num_rows, DEFAULT_CHUNK_ROWS)):
+        chunk = _roster_chunk(staff, min(DEFAULT_CHUNK_ROWS, num_rows - start), seed, chunk_index)
+        for offset in range(0, len(chunk), chunk_rows):
+            yield chunk.iloc[offset:offset + chunk_rows]
+
+
+def make_roster(num_rows, seed=0):
+    """Returns a synthetic roster as one DataFrame"""
+    return pd.concat(list(iter_roster_chunks(num_rows, seed)), ignore_index=True)
+
+
+def make_roster_csv(num_rows, seed=0):
+    """Returns a synthetic roster as CSV text"""
+    return make_roster(num_rows, seed).to_csv(index=False)
+
+
+def write_roster(path, num_rows, seed=0):
+    """Writes a synthetic roster to a CSV or Parquet file without holding more than one chunk in memory"""
+    if os.path.splitext(path)[1].lower() in (".parquet", ".pq"):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        try:
+            for chunk in iter_roster_chunks(num_rows, seed):
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        return path
+
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for index, chunk in enumerate(iter_roster_chunks(num_rows, seed)):
+            chunk.to_csv(f, index=False, header=index == 0)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a deterministic synthetic roster file.")
+    parser.add_argument("rows", type=int, help="Number of roster rows")
+    parser.add_argument("path", help="Output .csv or .parquet file")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0)")
+    args = parser.parse_args(argv)
+    write_roster(args.path, args.rows, args.seed)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,375 +1,221 @@
+"""Streamlit app for the overload pay calculator: streamlit run paypy.py
+
+The calculation engine is in paypy_core, which loads without Streamlit.
+"""
 import streamlit as st
 import pandas as pd
-import os
-import base64
-from datetime import datetime
-import io
+import numpy as np
+from paypy_core import (
+    ARROW_EXTENSIONS,
+    COMPRESSED_CSV_EXTENSIONS,
+    OverloadPayCalculator,
+    PARQUET_EXTENSIONS,
+    ResultCache,
+    STREAMING_CHUNK_ROWS,
+    STREAMING_THRESHOLD_BYTES,
+    XLSX_EXTENSIONS,
+    load_snapshot,
+    page_rows,
+    school_name_from_filename,
+    snapshot_path,
+)
+from paypy_format import format_cents, money_cells
+from paypy_rules import load_rule_sets
+from paypy_metrics import shared_hooks_from_env
+from paypy_jobs import JobQueue
+from paypy_dedup import DEDUP_POLICIES
+from paypy_scenarios import ScenarioGrid
 
-class OverloadPayCalculator:
-    def __init__(self):
-        # Variables with default values
-        self.school_name = ""
-        self.num_weeks = 4
-        self.pay_rate = 1.25
-        self.show_only_nonzero = False
-        
-        # Data storage
-        self.data = None
-        self.processed_data = None
-        self.staff_totals = None
-        self.grand_total = {"total_overload": 0, "overload_pay": 0}
+# Detailed Results table: rows per page offered in the UI, and the row highlight for overloaded courses
+DETAIL_PAGE_SIZES = [25, 50, 100, 250, 1000]
+DETAIL_HIGHLIGHT = "background-color: #ffeded"
+
+# Duplicate section handling offered in the sidebar: label -> de-duplication policy
+DEDUP_OPTIONS = {"Count every row": None, **{label: policy for policy, label in DEDUP_POLICIES.items()}}
+
+# HTML report layouts offered for download: label -> split_by
+HTML_REPORT_LAYOUTS = {
+    "Single report": None,
+    "One file per staff member": "staff",
+    "One file per organization": "organization",
+}
+
+
+def _column_options(values):
+    """Returns the distinct non-missing values of a column as sorted strings, e.g. for a filter widget"""
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.cat.remove_unused_categories().cat.categories
+    return sorted({str(value) for value in pd.unique(pd.Series(values).dropna())})
+
+
+def _styled_detail_page(page):
+    """Formats a page of processed rows for display and highlights overloaded courses with one vectorized mask"""
+    page = page.reset_index(drop=True)
+    formatted = page.astype({col: object for col in page.columns if isinstance(page[col].dtype, pd.CategoricalDtype)})
+    formatted["Overload Pay Cents"] = money_cells(page["Overload Pay Cents"])
+    formatted = formatted.rename(columns={"Overload Pay Cents": "Overload Pay"})
     
-    def process_data(self, file, school_name, num_weeks, pay_rate, show_only_nonzero):
-        try:
-            # Update instance variables
-            self.school_name = school_name
-            self.num_weeks = num_weeks
-            self.pay_rate = pay_rate
-            self.show_only_nonzero = show_only_nonzero
-            
-            # Read CSV file
-            self.data = pd.read_csv(file)
-            
-            # Check required columns
-            required_cols = ["Course Title", "Staff Name", "Total Students"]
-            missing_cols = [col for col in required_cols if col not in self.data.columns]
-            
-            if missing_cols:
-                return False, f"The CSV file is missing required columns: {', '.join(missing_cols)}"
-            
-            # Filter for required courses and students > 0
-            course_mask = (
-                self.data["Course Title"].str.contains("MUSIC|PHYS ED|ART|CREATIVE", case=False, na=False) &
-                (self.data["Total Students"] > 0)
+    highlight = np.where(page["Total Overload"].to_numpy() > 0, DETAIL_HIGHLIGHT, "")
+    styles = pd.DataFrame(
+        np.repeat(highlight[:, None], len(formatted.columns), axis=1),
+        index=formatted.index,
+        columns=formatted.columns
+    )
+    return formatted.style.apply(lambda _: styles, axis=None)
+
+
+@st.cache_resource
+def get_result_cache():
+    """Returns the result cache shared by all Streamlit reruns and sessions"""
+    return ResultCache()
+
+
+@st.cache_resource
+def get_rule_sets():
+    """Returns the district rule sets from the rules config and the default district"""
+    return load_rule_sets()
+
+
+@st.cache_resource
+def get_job_queue():
+    """Returns the background job queue shared by all sessions"""
+    return JobQueue()
+
+
+@st.fragment(run_every=1.0)
+def show_job_progress(job):
+    """Polls a background job, rerunning the app once it has finished"""
+    if job.done:
+        st.rerun()
+    fraction, message = job.progress
+    st.progress(fraction, text=f"{message} ({job.filename})")
+
+
+def get_metrics_hooks():
+    """Returns the metrics hooks enabled in the environment, started once per server and shared with background jobs"""
+    return shared_hooks_from_env()
+
+
+def show_detailed_results(calculator):
+    """Shows the processed rows one page at a time with staff, organization and subject filters and sorting"""
+    rows = calculator.processed_df
+    
+    filter_cols = st.columns(3)
+    staff = filter_cols[0].multiselect("Staff", _column_options(rows["Staff Name"]), key="detail_staff")
+    organizations = filter_cols[1].multiselect(
+        "Organization", _column_options(rows["Organization"]), key="detail_organizations"
+    )
+    subjects = filter_cols[2].multiselect("Subject", calculator.rules.subjects, key="detail_subjects")
+    
+    sort_columns = [col for col in rows.columns if col != "Overload Pay Cents"] + ["Overload Pay"]
+    view_cols = st.columns(4)
+    sort_label = view_cols[0].selectbox("Sort by", sort_columns, index=sort_columns.index("Staff Name"), key="detail_sort")
+    descending = view_cols[1].checkbox("Descending", value=False, key="detail_descending")
+    page_size = view_cols[2].selectbox("Rows per page", DETAIL_PAGE_SIZES, index=1, key="detail_page_size")
+    
+    filtered = calculator.filter_rows(staff, organizations, subjects)
+    page_count = max(1, -(-len(filtered) // page_size))
+    page = view_cols[3].number_input("Page", min_value=1, max_value=page_count, value=1, key="detail_page")
+    page = min(int(page), page_count)
+    
+    # Rows are already ordered by staff name, so the default view needs no sort
+    sort_by = "Overload Pay Cents" if sort_label == "Overload Pay" else sort_label
+    if sort_by == "Staff Name" and not descending:
+        sort_by = None
+    page_data = page_rows(filtered, page, page_size, sort_by, descending)
+    
+    st.dataframe(_styled_detail_page(page_data), use_container_width=True, hide_index=True)
+    if len(filtered):
+        first = (page - 1) * page_size + 1
+        st.caption(f"Rows {first:,}-{first + len(page_data) - 1:,} of {len(filtered):,} (page {page} of {page_count})")
+    else:
+        st.caption("No rows match the selected filters.")
+
+
+def show_roster_problems(calculator):
+    """Lists the row-level problems found in the roster, with the quarantined rows for download"""
+    errors = calculator.validation_errors
+    quarantined = calculator.quarantined_rows
+    if quarantined is not None and len(quarantined):
+        st.warning(f"{len(quarantined):,} rows with errors were left out of the calculation. Fix them in the roster and upload it again.")
+        st.download_button(
+            "Download Quarantined Rows",
+            data=quarantined.to_csv(index=False).encode("utf-8"),
+            file_name=f"{calculator.school_name or 'School'}_Quarantined_Rows.csv",
+            mime="text/csv"
+        )
+    warnings = int((errors["Severity"] == "warning").sum())
+    if warnings:
+        if calculator.dedup_policy is None:
+            st.info(f"{warnings:,} rows duplicate an earlier section; they are included in the calculation.")
+        else:
+            st.info(
+                f"{warnings:,} rows duplicate an earlier section; they are merged under the selected policy "
+                f"({DEDUP_POLICIES[calculator.dedup_policy].lower()}). See Merged Sections."
             )
-            relevant_courses = self.data[course_mask].copy()
-            
-            if relevant_courses.empty:
-                return False, "No MUSIC, PHYS ED, ART, or CREATIVE courses with students > 0 found in the file."
-            
-            # Process the data
-            self.processed_data = []
-            
-            for _, row in relevant_courses.iterrows():
-                # Determine base students based on course title
-                course_title = str(row["Course Title"]).upper()
-                
-                if ("MIXED" in course_title or
-                    " 1" in course_title or
-                    " 2" in course_title or
-                    " 3" in course_title):
-                    base_students = 23
-                elif " 4" in course_title or " 5" in course_title:
-                    base_students = 26
-                elif "KINDER" in course_title or " K" in course_title:
-                    base_students = 22
-                else:
-                    base_students = 23  # Default
-                
-                # Calculate overload
-                total_overload = max(0, row["Total Students"] - base_students)
-                
-                # Calculate overload pay
-                overload_pay = total_overload * self.pay_rate * self.num_weeks
-                
-                # Add to processed data
-                processed_row = {
-                    "Year": row.get("Year", ""),
-                    "Organization": row.get("Organization", ""),
-                    "Course Title": row["Course Title"],
-                    "Staff Name": row["Staff Name"],
-                    "Total Students": row["Total Students"],
-                    "Base Students": base_students,
-                    "Total Overload": total_overload,
-                    "Overload Pay": round(overload_pay, 2)
-                }
-                self.processed_data.append(processed_row)
-            
-            # Convert to DataFrame and sort by Staff Name
-            self.processed_df = pd.DataFrame(self.processed_data)
-            self.processed_df = self.processed_df.sort_values("Staff Name")
-            
-            # Calculate staff totals
-            self.staff_totals = self.processed_df.groupby("Staff Name").agg({
-                "Total Overload": "sum",
-                "Overload Pay": "sum"
-            }).reset_index()
-            
-            # Calculate grand total
-            self.grand_total = {
-                "total_overload": self.staff_totals["Total Overload"].sum(),
-                "overload_pay": self.staff_totals["Overload Pay"].sum()
-            }
-            
-            return True, "Data processed successfully"
-            
-        except Exception as e:
-            return False, f"An error occurred while processing the file: {str(e)}"
+    st.dataframe(errors, use_container_width=True, hide_index=True)
+
+
+def _parse_numbers(text, cast):
+    """Parses a comma-separated list of numbers, e.g. '1.25, 1.50', keeping the first of any repeats"""
+    return list(dict.fromkeys(cast(value) for value in text.replace(";", ",").split(",") if value.strip()))
+
+
+def show_scenarios(calculator, pay_rate, num_weeks):
+    """Prices a grid of pay rates, weeks and threshold changes from the processed roster, side by side"""
+    st.caption(
+        "Every combination below is priced from the roster already processed, without reading it again. "
+        "Threshold changes move every base-student threshold by the given number of students."
+    )
+    input_cols = st.columns(3)
+    rates_text = input_cols[0].text_input("Pay rates ($)", value=f"{pay_rate:.2f}, {pay_rate + 0.25:.2f}, {pay_rate + 0.50:.2f}")
+    weeks_text = input_cols[1].text_input("Numbers of weeks", value=f"{num_weeks}")
+    offsets_text = input_cols[2].text_input("Threshold changes (students)", value="-1, 0, 1")
+    try:
+        grid = ScenarioGrid.with_offsets(
+            calculator.rules, _parse_numbers(rates_text, float), _parse_numbers(weeks_text, int),
+            _parse_numbers(offsets_text, int)
+        )
+        result = grid.evaluate(calculator)
+    except ValueError as e:
+        st.error(f"Could not price the scenarios: {e}")
+        return
     
-    def get_download_link_csv(self):
-        """Generates a download link for the CSV export"""
-        if not hasattr(self, 'processed_df'):
-            return None
-            
-        # Filter data if nonzero option is selected
-        export_data = self.processed_df
-        if self.show_only_nonzero:
-            export_data = export_data[export_data["Total Overload"] > 0]
-        
-        # Create a copy of the DataFrame for export
-        export_df = export_data.copy()
-        
-        # Format the Overload Pay column with dollar signs
-        export_df["Overload Pay"] = export_df["Overload Pay"].apply(lambda x: f"${x:.2f}")
-        
-        # Create final DataFrame for export with staff totals
-        final_data = []
-        current_staff = None
-        
-        # Create a copy of staff totals for formatting
-        staff_totals_df = self.staff_totals.copy()
-        staff_totals_df["Overload Pay"] = staff_totals_df["Overload Pay"].apply(lambda x: f"${x:.2f}")
-        
-        # Iterate through the sorted rows
-        for _, row in export_df.iterrows():
-            if current_staff is not None and current_staff != row["Staff Name"]:
-                # Add total row for previous staff
-                total_row = {col: "" for col in export_df.columns}
-                total_row["Course Title"] = "TOTAL"
-                total_row["Staff Name"] = current_staff
-                staff_total = staff_totals_df[staff_totals_df["Staff Name"] == current_staff].iloc[0]
-                total_row["Total Overload"] = staff_total["Total Overload"]
-                total_row["Overload Pay"] = staff_total["Overload Pay"]
-                final_data.append(total_row)
-                
-                # Add blank row
-                blank_row = {col: "" for col in export_df.columns}
-                final_data.append(blank_row)
-            
-            # Add the current data row
-            final_data.append(row.to_dict())
-            current_staff = row["Staff Name"]
-        
-        # Add total for the last staff member
-        if current_staff is not None:
-            total_row = {col: "" for col in export_df.columns}
-            total_row["Course Title"] = "TOTAL"
-            total_row["Staff Name"] = current_staff
-            staff_total = staff_totals_df[staff_totals_df["Staff Name"] == current_staff].iloc[0]
-            total_row["Total Overload"] = staff_total["Total Overload"]
-            total_row["Overload Pay"] = staff_total["Overload Pay"]
-            final_data.append(total_row)
-        
-        # Convert to DataFrame
-        final_df = pd.DataFrame(final_data)
-        
-        # Generate CSV
-        csv = final_df.to_csv(index=False)
-        b64 = base64.b64encode(csv.encode()).decode()
-        filename = f"{self.school_name or 'School'}_Overload_Pay.csv"
-        href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">Download CSV File</a>'
-        return href
+    st.markdown(f"**Totals for {len(grid)} scenarios** (change against the current calculation)")
+    scenarios = result.scenarios.copy()
+    scenarios["Pay Rate"] = scenarios["Pay Rate"].map(lambda rate: f"${rate:.2f}")
+    for col in ["Overload Pay Cents", "Change Cents"]:
+        scenarios[col] = money_cells(scenarios[col])
+    scenarios = scenarios.rename(columns={"Overload Pay Cents": "Overload Pay", "Change Cents": "Change"})
+    st.dataframe(scenarios, use_container_width=True, hide_index=True)
     
-    def get_download_link_html(self):
-        """Generates a download link for the HTML report"""
-        if not hasattr(self, 'processed_df'):
-            return None
-            
-        # Filter data if nonzero option is selected
-        display_data = self.processed_df
-        if self.show_only_nonzero:
-            display_data = display_data[display_data["Total Overload"] > 0]
-            
-        # Start building HTML content
-        html_content = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>{self.school_name or 'School'} Overload Pay Report</title>
-            <style>
-                body {{
-                    font-family: Arial, sans-serif;
-                    margin: 20px;
-                    line-height: 1.4;
-                }}
-                h1, h2, h3 {{
-                    color: #333;
-                }}
-                table {{
-                    border-collapse: collapse;
-                    width: 100%;
-                    margin-bottom: 30px;
-                }}
-                th, td {{
-                    border: 1px solid #ddd;
-                    padding: 8px;
-                }}
-                th {{
-                    background-color: #2c5f9b;
-                    color: white;
-                    font-weight: bold;
-                    text-align: left;
-                }}
-                tr:nth-child(even) {{
-                    background-color: #f2f2f2;
-                }}
-                tr:hover {{
-                    background-color: #ddd;
-                }}
-                .total-row {{
-                    font-weight: bold;
-                    background-color: #e6eeff !important;
-                }}
-                .money {{
-                    text-align: right;
-                }}
-                .staff-section {{
-                    margin-bottom: 30px;
-                }}
-                .summary-table {{
-                    width: 50%;
-                    margin: 20px 0;
-                }}
-                .overload-highlight {{
-                    background-color: #ffe6e6;
-                }}
-                .notice {{
-                    background-color: #e6f2ff;
-                    border: 1px solid #b3d9ff;
-                    padding: 10px;
-                    margin: 20px 0;
-                    border-radius: 5px;
-                }}
-            </style>
-        </head>
-        <body>
-            <h1>{self.school_name or 'School'} Overload Pay Report</h1>
-            <p>Report generated on {datetime.now().strftime('%Y-%m-%d at %H:%M:%S')}</p>
-            
-            <div class="notice">
-                <h3>Calculation Parameters:</h3>
-                <p>Payment Period: <strong>{self.num_weeks} week{'s' if self.num_weeks != 1 else ''}</strong></p>
-                <p>Pay Rate: <strong>${self.pay_rate:.2f}</strong> per overload student per week</p>
-                <p>Base Student thresholds: MIXED/1/2/3 = 23 students, 4/5 = 26 students, KINDER/K = 22 students</p>
-            </div>
-        """
-        
-        # Group data by staff name
-        staff_groups = {}
-        for _, row in display_data.iterrows():
-            staff_name = row["Staff Name"]
-            if staff_name not in staff_groups:
-                staff_groups[staff_name] = []
-            staff_groups[staff_name].append(row)
-        
-        # Add staff sections
-        for staff_name, rows in staff_groups.items():
-            html_content += f"""
-            <div class="staff-section">
-                <h3>{staff_name}</h3>
-                <table>
-                    <thead>
-                        <tr>
-                            <th>Year</th>
-                            <th>Organization</th>
-                            <th>Course Title</th>
-                            <th>Total Students</th>
-                            <th>Base Students</th>
-                            <th>Total Overload</th>
-                            <th>Overload Pay</th>
-                        </tr>
-                    </thead>
-                    <tbody>
-            """
-            
-            # Add rows for this staff
-            staff_total_overload = 0
-            staff_total_pay = 0
-            
-            for row in rows:
-                overload = row["Total Overload"]
-                pay = row["Overload Pay"]
-                staff_total_overload += overload
-                staff_total_pay += pay
-                
-                highlight = ' class="overload-highlight"' if overload > 0 else ''
-                
-                html_content += f"""
-                    <tr{highlight}>
-                        <td>{row["Year"]}</td>
-                        <td>{row["Organization"]}</td>
-                        <td>{row["Course Title"]}</td>
-                        <td>{row["Total Students"]}</td>
-                        <td>{row["Base Students"]}</td>
-                        <td>{overload}</td>
-                        <td class="money">${pay:.2f}</td>
-                    </tr>
-                """
-            
-            # Add total row for this staff
-            html_content += f"""
-                    <tr class="total-row">
-                        <td colspan="4">TOTAL</td>
-                        <td></td>
-                        <td>{staff_total_overload}</td>
-                        <td class="money">${staff_total_pay:.2f}</td>
-                    </tr>
-                    </tbody>
-                </table>
-            </div>
-            """
-        
-        # Add summary table
-        html_content += """
-            <h2>Summary of Teacher Overload Pay</h2>
-            <table class="summary-table">
-                <thead>
-                    <tr>
-                        <th>Staff Name</th>
-                        <th>Total Overload</th>
-                        <th>Overload Pay</th>
-                    </tr>
-                </thead>
-                <tbody>
-        """
-        
-        for _, row in self.staff_totals.iterrows():
-            highlight = ' class="overload-highlight"' if row["Total Overload"] > 0 else ''
-            html_content += f"""
-                <tr{highlight}>
-                    <td>{row["Staff Name"]}</td>
-                    <td>{int(row["Total Overload"])}</td>
-                    <td class="money">${row["Overload Pay"]:.2f}</td>
-                </tr>
-            """
-        
-        # Add grand total
-        html_content += f"""
-                <tr class="total-row">
-                    <td><strong>DISTRICT TOTAL</strong></td>
-                    <td><strong>{int(self.grand_total["total_overload"])}</strong></td>
-                    <td class="money"><strong>${self.grand_total["overload_pay"]:.2f}</strong></td>
-                </tr>
-                </tbody>
-            </table>
-            
-            <div class="notice">
-                <p><strong>Notes:</strong></p>
-                <ul>
-                    <li>This report only includes MUSIC, PHYS ED, ART, and CREATIVE courses with students > 0</li>
-                    <li>Rows highlighted in pink indicate courses with overload students</li>
-                    <li>Payment calculation: Overload Students × ${self.pay_rate:.2f} × {self.num_weeks} week{'s' if self.num_weeks != 1 else ''}</li>
-                </ul>
-            </div>
-        </body>
-        </html>
-        """
+    st.markdown("**Overload pay by teacher**")
+    staff_pay = result.staff_pay.copy()
+    for col in staff_pay.columns[1:]:
+        staff_pay[col] = money_cells(staff_pay[col])
+    st.dataframe(staff_pay, use_container_width=True, hide_index=True)
+    st.download_button(
+        "Download Scenarios by Teacher (CSV)",
+        data=staff_pay.to_csv(index=False).encode("utf-8"),
+        file_name=f"{calculator.school_name or 'School'}_Overload_Pay_Scenarios.csv",
+        mime="text/csv"
+    )
+
+
+def show_diagnostics(calculator):
+    """Shows the latest run's per-stage metrics and memory report in a Diagnostics expander"""
+    metrics = calculator.metrics
+    if metrics is None:
+        return
+    
+    with st.expander("Diagnostics"):
+        served_from = f", served from the {metrics.cache} cache" if metrics.cache else ""
+        st.caption(f"Status: {metrics.status}{served_from}. Processing took {metrics.seconds:.3f}s.")
+        st.dataframe(metrics.to_frame(), use_container_width=True, hide_index=True)
         
-        # Create download link
-        b64 = base64.b64encode(html_content.encode()).decode()
-        filename = f"{self.school_name or 'School'}_Overload_Pay_Report.html"
-        href = f'<a href="data:text/html;base64,{b64}" download="{filename}">Download HTML Report</a>'
-        return href
+        memory_report = calculator.memory_report()
+        if memory_report is not None:
+            st.dataframe(memory_report, use_container_width=True, hide_index=True)
 
 
 def main():
@@ -380,47 +226,128 @@ def main():
     )
     
     st.title("Elementary School Overload Pay Calculator")
-    st.markdown("Upload a class roster CSV file to calculate teacher overload pay based on class sizes.")
+    st.markdown("Upload a class roster file (CSV, Excel, Parquet or Arrow) to calculate teacher overload pay based on class sizes.")
     
-    # Create calculator instance
-    calculator = OverloadPayCalculator()
+    # Parsed rosters and results are shared through the result cache
+    cache = get_result_cache()
+    rule_sets, district = get_rule_sets()
     
     # Sidebar for inputs
     with st.sidebar:
         st.header("Settings")
         
-        uploaded_file = st.file_uploader("Upload CSV File", type=["csv"])
+        uploaded_file = st.file_uploader(
+            "Upload Roster File",
+            type=["csv"] + [
+                extension.lstrip(".")
+                for extension in COMPRESSED_CSV_EXTENSIONS + XLSX_EXTENSIONS + PARQUET_EXTENSIONS + ARROW_EXTENSIONS
+            ]
+        )
         
         # Extract school name from filename
         school_name = ""
         if uploaded_file is not None:
-            filename = uploaded_file.name
-            name_without_ext = os.path.splitext(filename)[0]
-            # Clean up common suffixes
-            for suffix in ["_roster", "_classes", "_data", "_overload"]:
-                name_without_ext = name_without_ext.replace(suffix, "")
-            school_name = name_without_ext.replace("_", " ").title()
+            school_name = school_name_from_filename(uploaded_file.name)
         
         school_name = st.text_input("School Name", value=school_name)
         num_weeks = st.number_input("Number of Weeks", min_value=1, max_value=52, value=4)
         pay_rate = st.number_input("Pay Rate ($)", min_value=0.01, value=1.25, format="%.2f")
         show_only_nonzero = st.checkbox("Show only courses with overload", value=False)
+        compare_previous = st.checkbox(
+            "Compare with previous pay period",
+            value=False,
+            help="Recalculate only sections that changed since the saved previous period and list pay changes."
+        )
+        if len(rule_sets) > 1:
+            district = st.selectbox("District Rules", sorted(rule_sets), index=sorted(rule_sets).index(district))
+        dedup_policy = DEDUP_OPTIONS[st.selectbox(
+            "Duplicate sections",
+            list(DEDUP_OPTIONS),
+            help="How to count a section listed more than once (same year, organization, course, staff and "
+                 "Section ID if the roster has one). Splitting divides the students across co-teachers of a section."
+        )]
+        run_in_background = st.checkbox(
+            "Run in background",
+            value=False,
+            help="Queue the calculation on a background worker and show its progress; identical uploads reuse "
+                 "the same job. Not used when comparing with the previous period."
+        )
+        show_diagnostics_panel = st.checkbox(
+            "Show diagnostics",
+            value=False,
+            help="Show per-stage timings, row counts and memory use for the latest calculation."
+        )
         
         # Add a description about file format
         st.markdown("---")
-        st.caption("File must include columns for Course Title, Staff Name, and Total Students.")
+        st.caption(
+            "File must include columns for Course Title, Staff Name, and Total Students. Common alternatives "
+            "such as Teacher or Enrollment are recognized; rows with bad values are set aside for review."
+        )
+    
+    # Create calculator instance
+    calculator = OverloadPayCalculator(rule_sets[district], metrics_hooks=get_metrics_hooks(), dedup_policy=dedup_policy)
     
     # Main content
     if uploaded_file is not None:
-        # Process button
+        # Process button; results stay on screen (and reprice from the cache) as settings change
         if st.button("Calculate Overload Pay", type="primary"):
-            success, message = calculator.process_data(
-                uploaded_file, 
-                school_name, 
-                num_weeks, 
-                pay_rate, 
-                show_only_nonzero
-            )
+            st.session_state["calculate"] = True
+        
+        if st.session_state.get("calculate"):
+            chunksize = STREAMING_CHUNK_ROWS if uploaded_file.size > STREAMING_THRESHOLD_BYTES else None
+            if run_in_background and not compare_previous:
+                # Resubmitting on every rerun returns the same job while the settings are unchanged
+                job = get_job_queue().submit(
+                    uploaded_file.getvalue(),
+                    uploaded_file.name,
+                    school_name=school_name,
+                    num_weeks=num_weeks,
+                    pay_rate=pay_rate,
+                    show_only_nonzero=show_only_nonzero,
+                    district=district,
+                    dedup_policy=dedup_policy,
+                    chunksize=chunksize
+                )
+                if not job.done:
+                    show_job_progress(job)
+                    return
+                
+                result = job.result
+                if result is None:
+                    success, message = False, job.error
+                else:
+                    calculator = result["calculator"]
+                    success, message = result["success"], result["message"]
+                    if success:
+                        # Keep the reports the job built for the export buttons below
+                        export_key = (
+                            calculator.file_hash, calculator.rules.fingerprint, dedup_policy, num_weeks, pay_rate,
+                            show_only_nonzero, school_name
+                        )
+                        cache.put(("csv",) + export_key, result["csv_bytes"])
+                        cache.put(("html", None) + export_key, result["html_bytes"])
+            elif compare_previous:
+                # Reuse the previous period's rows for unchanged sections
+                success, message = calculator.process_data_incremental(
+                    uploaded_file,
+                    load_snapshot(snapshot_path(school_name)),
+                    school_name,
+                    num_weeks,
+                    pay_rate,
+                    show_only_nonzero,
+                    chunksize=chunksize
+                )
+            else:
+                success, message = calculator.process_data(
+                    uploaded_file, 
+                    school_name, 
+                    num_weeks, 
+                    pay_rate, 
+                    show_only_nonzero,
+                    chunksize=chunksize,
+                    cache=cache
+                )
             
             if success:
                 st.success(message)
@@ -429,43 +356,35 @@ def main():
                 st.markdown("### Calculation Details")
                 st.markdown(f"""
                 - Calculation Method: Overload Pay = Overload Students × ${pay_rate:.2f} × {num_weeks} week{'s' if num_weeks != 1 else ''}
-                - Base Student thresholds: MIXED/1/2/3 = 23 students, 4/5 = 26 students, KINDER/K = 22 students
-                - Total Overload Students: {int(calculator.grand_total['total_overload'])}, Total Overload Pay: ${calculator.grand_total['overload_pay']:.2f}
+                - Base Student thresholds: {calculator.rules.threshold_text()}
+                - Total Overload Students: {int(calculator.grand_total['total_overload'])}, Total Overload Pay: {format_cents(calculator.grand_total['overload_pay_cents'])}
                 """)
                 
                 # Create tabs for different views
-                tab1, tab2 = st.tabs(["Detailed Results", "Summary by Teacher"])
+                tab_names = ["Detailed Results", "Summary by Teacher"]
+                if calculator.change_report is not None:
+                    tab_names.append("Changes Since Last Period")
+                has_merged = calculator.dedup_summary is not None and not calculator.dedup_summary.empty
+                if has_merged:
+                    tab_names.append("Merged Sections")
+                tab_names.append("What-if Scenarios")
+                has_problems = calculator.validation_errors is not None and not calculator.validation_errors.empty
+                if has_problems:
+                    tab_names.append("Roster Problems")
+                tabs = st.tabs(tab_names)
+                tab1, tab2 = tabs[:2]
                 
                 # Tab 1: Detailed Results
                 with tab1:
-                    # Display data
-                    display_data = calculator.processed_df
-                    
-                    # Filter for non-zero overload if the option is selected
-                    if show_only_nonzero:
-                        display_data = display_data[display_data["Total Overload"] > 0]
-                    
-                    # Highlight rows with overload
-                    def highlight_overload(row):
-                        if row["Total Overload"] > 0:
-                            return ['background-color: #ffeded'] * len(row)
-                        return [''] * len(row)
-                    
-                    # Format the Overload Pay column with dollar signs
-                    display_data_formatted = display_data.copy()
-                    display_data_formatted["Overload Pay"] = display_data_formatted["Overload Pay"].apply(lambda x: f"${x:.2f}")
-                    
-                    # Display the table with highlighting
-                    st.dataframe(
-                        display_data_formatted.style.apply(highlight_overload, axis=1),
-                        use_container_width=True
-                    )
+                    # Only the visible page is formatted, styled and sent to the browser
+                    show_detailed_results(calculator)
                 
                 # Tab 2: Summary by Teacher
                 with tab2:
                     # Create a formatted copy of staff totals
                     staff_totals_formatted = calculator.staff_totals.copy()
-                    staff_totals_formatted["Overload Pay"] = staff_totals_formatted["Overload Pay"].apply(lambda x: f"${x:.2f}")
+                    staff_totals_formatted["Overload Pay Cents"] = money_cells(staff_totals_formatted["Overload Pay Cents"])
+                    staff_totals_formatted = staff_totals_formatted.rename(columns={"Overload Pay Cents": "Overload Pay"})
                     
                     # Display the table
                     st.dataframe(
@@ -477,41 +396,132 @@ def main():
                     st.markdown(f"""
                     **GRAND TOTAL:**  
                     Total Overload Students: **{int(calculator.grand_total['total_overload'])}**  
-                    Total Overload Pay: **${calculator.grand_total['overload_pay']:.2f}**
+                    Total Overload Pay: **{format_cents(calculator.grand_total['overload_pay_cents'])}**
                     """)
                 
+                # Tab 3: Changes since the previous pay period
+                if calculator.change_report is not None:
+                    with tabs[2]:
+                        if calculator.change_report.empty:
+                            st.info("No teacher's overload pay changed since the previous period.")
+                        else:
+                            change_report_formatted = calculator.change_report.copy()
+                            for col in ["Previous Pay", "Current Pay", "Pay Change"]:
+                                change_report_formatted[col] = change_report_formatted[col].apply(lambda x: f"${x:.2f}")
+                            st.dataframe(change_report_formatted, use_container_width=True)
+                    
+                    if st.button("Save as Previous Period"):
+                        calculator.save_snapshot(snapshot_path(school_name))
+                        st.success(f"Saved this period for {school_name or 'School'}; the next upload will be compared against it.")
+                
+                # Sections listed more than once and how they were counted
+                if has_merged:
+                    with tabs[tab_names.index("Merged Sections")]:
+                        st.caption(
+                            f"{len(calculator.dedup_summary):,} sections were listed more than once and counted "
+                            f"once: {DEDUP_POLICIES[calculator.dedup_policy].lower()}."
+                        )
+                        st.dataframe(calculator.dedup_summary, use_container_width=True, hide_index=True)
+                
+                # Pay rates, weeks and thresholds under negotiation, priced without reprocessing
+                with tabs[tab_names.index("What-if Scenarios")]:
+                    show_scenarios(calculator, pay_rate, num_weeks)
+                
+                # Last tab: rows quarantined or flagged while reading the roster
+                if has_problems:
+                    with tabs[-1]:
+                        show_roster_problems(calculator)
+                
                 # Download links
                 st.markdown("### Export Options")
-                col1, col2 = st.columns(2)
+                col1, col2, col3 = st.columns(3)
+                
+                export_key = (
+                    calculator.file_hash, calculator.rules.fingerprint, dedup_policy, num_weeks, pay_rate,
+                    show_only_nonzero, school_name
+                )
                 
                 with col1:
-                    csv_link = calculator.get_download_link_csv()
-                    if csv_link:
-                        st.markdown(csv_link, unsafe_allow_html=True)
+                    csv_bytes = cache.get(("csv",) + export_key)
+                    if csv_bytes is None:
+                        csv_bytes = calculator.get_csv_report_bytes()
+                        cache.put(("csv",) + export_key, csv_bytes)
+                    if csv_bytes:
+                        st.download_button(
+                            "Download CSV File",
+                            data=csv_bytes,
+                            file_name=f"{school_name or 'School'}_Overload_Pay.csv",
+                            mime="text/csv"
+                        )
                 
                 with col2:
-                    html_link = calculator.get_download_link_html()
-                    if html_link:
-                        st.markdown(html_link, unsafe_allow_html=True)
+                    # Workbooks are slow to build, so one is only made when asked for
+                    xlsx_bytes = cache.get(("xlsx",) + export_key)
+                    if xlsx_bytes is None and st.button("Prepare Excel File"):
+                        with st.spinner("Building the Excel file..."):
+                            xlsx_bytes = calculator.get_xlsx_report_bytes()
+                        cache.put(("xlsx",) + export_key, xlsx_bytes)
+                    if xlsx_bytes:
+                        st.download_button(
+                            "Download Excel File",
+                            data=xlsx_bytes,
+                            file_name=f"{school_name or 'School'}_Overload_Pay.xlsx",
+                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                        )
+                
+                with col3:
+                    html_layout = st.selectbox("HTML report layout", list(HTML_REPORT_LAYOUTS))
+                    split_by = HTML_REPORT_LAYOUTS[html_layout]
+                    html_bytes = cache.get(("html", split_by) + export_key)
+                    if html_bytes is None:
+                        if split_by:
+                            html_bytes = calculator.get_html_reports_zip(split_by)
+                        else:
+                            html_bytes = calculator.get_html_report_bytes()
+                        cache.put(("html", split_by) + export_key, html_bytes)
+                    if html_bytes:
+                        if split_by:
+                            st.download_button(
+                                "Download HTML Reports (ZIP)",
+                                data=html_bytes,
+                                file_name=f"{school_name or 'School'}_Overload_Pay_Reports.zip",
+                                mime="application/zip"
+                            )
+                        else:
+                            st.download_button(
+                                "Download HTML Report",
+                                data=html_bytes,
+                                file_name=f"{school_name or 'School'}_Overload_Pay_Report.html",
+                                mime="text/html"
+                            )
             
             else:
                 st.error(message)
+                if calculator.validation_errors is not None and not calculator.validation_errors.empty:
+                    show_roster_problems(calculator)
+            
+            if show_diagnostics_panel:
+                show_diagnostics(calculator)
     else:
+        st.session_state["calculate"] = False
+        
         # Show placeholder when no file is uploaded
-        st.info("Please upload a CSV file to begin.")
+        st.info("Please upload a roster file to begin.")
         
         # Add demo image or instructions
-        st.markdown("""
-        ### CSV File Format
-        Your CSV file should contain at least these columns:
-        - **Course Title**: The name of the course (must include MUSIC, PHYS ED, ART, or CREATIVE to be counted)
+        thresholds = "\n".join(
+            f"        - {label}: {base_students} students" for label, base_students in calculator.rules.threshold_items()
+        )
+        st.markdown(f"""
+        ### Roster File Format
+        Your CSV, Excel (.xlsx), Parquet or Arrow file should contain at least these columns
+        (CSV files may also be gzip or zip compressed; Excel rosters are read from the first sheet):
+        - **Course Title**: The name of the course (must include {calculator.rules.subject_text()} to be counted)
         - **Staff Name**: The teacher's name
         - **Total Students**: The number of students in the class
         
         The calculator will automatically determine the base student threshold based on course titles:
-        - MIXED/1/2/3: 23 students
-        - 4/5: 26 students
-        - KINDER/K: 22 students
+{thresholds}
         """)
 
 if __name__ == "__main__":
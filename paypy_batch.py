@@ -0,0 +1,303 @@
+"""Headless batch processing of many school rosters.
+
+Usage: python paypy_batch.py rosters/ --output-dir reports --weeks 4 --pay-rate 1.25
+"""
+import argparse
+import csv
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from paypy_core import (
+    ARROW_EXTENSIONS,
+    COMPRESSED_CSV_EXTENSIONS,
+    OverloadPayCalculator,
+    PARQUET_EXTENSIONS,
+    STREAMING_CHUNK_ROWS,
+    STREAMING_THRESHOLD_BYTES,
+    XLSX_EXTENSIONS,
+    load_snapshot,
+    school_name_from_filename,
+    snapshot_path,
+)
+from paypy_dedup import DEDUP_KEY, DEDUP_POLICIES
+from paypy_format import format_cents, safe_filename, unique_filename
+from paypy_metrics import JsonLinesExporter
+from paypy_rollup import Rollup
+from paypy_rules import get_rule_set
+from paypy_store import ResultStore
+
+ROSTER_EXTENSIONS = (".csv",) + COMPRESSED_CSV_EXTENSIONS + XLSX_EXTENSIONS + PARQUET_EXTENSIONS + ARROW_EXTENSIONS
+
+SUMMARY_COLUMNS = [
+    "School", "Source File", "Courses", "Staff", "Total Overload", "Overload Pay", "Quarantined", "Merged Rows",
+    "Seconds", "Status",
+]
+SUMMARY_FIELDS = [column if column != "Overload Pay" else "Overload Pay Cents" for column in SUMMARY_COLUMNS]
+
+# Rollup reports written with --rollup: file name -> dimensions
+ROLLUP_REPORTS = {
+    "rollup_by_school.csv": ["School", "Period"],
+    "rollup_by_organization.csv": ["School", "Organization", "Period"],
+    "rollup_by_staff.csv": ["School", "Staff Name", "Period"],
+    "rollup_by_subject.csv": ["Subject", "Period"],
+}
+
+
+def find_rosters(sources):
+    """Expands directories and glob patterns into a sorted list of roster file paths"""
+    paths = set()
+    for source in sources:
+        if os.path.isdir(source):
+            for extension in ROSTER_EXTENSIONS:
+                paths.update(glob.glob(os.path.join(source, f"*{extension}")))
+        else:
+            paths.update(path for path in glob.glob(source) if os.path.isfile(path))
+    return sorted(paths)
+
+
+def duplicate_school_names(paths):
+    """Returns school names shared by more than one roster, with their paths"""
+    schools = {}
+    for path in paths:
+        schools.setdefault(school_name_from_filename(path), []).append(path)
+    return {school_name: school_paths for school_name, school_paths in schools.items() if len(school_paths) > 1}
+
+
+def process_roster(path, output_dir, num_weeks, pay_rate, show_only_nonzero, chunksize=None, split_html=None,
+                   district=None, rules_path=None, snapshot_dir=None, store_dir=None, period=None, metrics_path=None,
+                   rollup=False, dedup_policy=None, dedup_key=None, xlsx=False):
+    """Processes one roster and writes its CSV and HTML reports (and Excel export with xlsx), returning a summary row"""
+    start = time.perf_counter()
+    school_name = school_name_from_filename(path)
+    summary = {
+        "School": school_name,
+        "Source File": path,
+        "Courses": 0,
+        "Staff": 0,
+        "Total Overload": 0,
+        "Overload Pay Cents": 0,
+        "Quarantined": 0,
+        "Merged Rows": 0,
+    }
+
+    if chunksize is None and os.path.getsize(path) > STREAMING_THRESHOLD_BYTES:
+        chunksize = STREAMING_CHUNK_ROWS
+
+    metrics_hooks = [JsonLinesExporter(metrics_path)] if metrics_path else []
+    calculator = OverloadPayCalculator(
+        get_rule_set(district, rules_path), metrics_hooks=metrics_hooks, dedup_policy=dedup_policy, dedup_key=dedup_key
+    )
+    if snapshot_dir:
+        # Compare against the school's previous period and save this period for the next run
+        previous = load_snapshot(snapshot_path(school_name, snapshot_dir))
+        success, message = calculator.process_data_incremental(
+            path, previous, school_name, num_weeks, pay_rate, show_only_nonzero, chunksize=chunksize
+        )
+    else:
+        success, message = calculator.process_data(
+            path, school_name, num_weeks, pay_rate, show_only_nonzero, chunksize=chunksize
+        )
+
+    report_name = school_name or "School"
+    if calculator.validation_errors is not None and not calculator.validation_errors.empty:
+        # Rows left out for errors (and duplicate warnings) are listed for the school to fix
+        calculator.validation_errors.to_csv(os.path.join(output_dir, f"{report_name}_Roster_Problems.csv"), index=False)
+        summary["Quarantined"] = len(calculator.quarantined_rows)
+
+    if success:
+        with open(os.path.join(output_dir, f"{report_name}_Overload_Pay.csv"), "w", newline="", encoding="utf-8") as f:
+            calculator.write_csv_report(f)
+        with open(os.path.join(output_dir, f"{report_name}_Overload_Pay_Report.html"), "w", encoding="utf-8") as f:
+            calculator.write_html_report(f)
+        if xlsx:
+            calculator.write_xlsx_report(os.path.join(output_dir, f"{report_name}_Overload_Pay.xlsx"))
+        if snapshot_dir:
+            calculator.change_report.to_csv(os.path.join(output_dir, f"{report_name}_Pay_Changes.csv"), index=False)
+            calculator.save_snapshot(snapshot_path(school_name, snapshot_dir))
+        if store_dir:
+            ResultStore(store_dir).write(calculator, school_name, period)
+        if calculator.dedup_summary is not None and not calculator.dedup_summary.empty:
+            calculator.dedup_summary.to_csv(os.path.join(output_dir, f"{report_name}_Merged_Sections.csv"), index=False)
+            summary["Merged Rows"] = int(calculator.dedup_summary["Rows"].sum())
+        if split_html:
+            write_split_html_reports(calculator, os.path.join(output_dir, f"{report_name}_Overload_Pay_Reports"), split_html)
+        if rollup:
+            summary["Rollup"] = Rollup.from_calculator(calculator, period or "", school_name)
+
+        summary.update({
+            "Courses": len(calculator.processed_df),
+            "Staff": len(calculator.staff_totals),
+            "Total Overload": int(calculator.grand_total["total_overload"]),
+            "Overload Pay Cents": calculator.grand_total["overload_pay_cents"],
+        })
+
+    summary["Seconds"] = round(time.perf_counter() - start, 3)
+    summary["Status"] = "OK" if success else message
+    return summary
+
+
+def write_split_html_reports(calculator, report_dir, split_by):
+    """Writes one HTML report per staff member or organization into report_dir"""
+    os.makedirs(report_dir, exist_ok=True)
+    used_names = set()
+    for name, chunks in calculator.iter_html_reports(split_by):
+        filename = unique_filename(f"{safe_filename(name or 'Unassigned')}.html", used_names)
+        with open(os.path.join(report_dir, filename), "w", encoding="utf-8") as f:
+            f.writelines(chunks)
+
+
+def write_district_summary(summaries, output_dir):
+    """Writes one row per school plus a DISTRICT TOTAL row"""
+    path = os.path.join(output_dir, "district_summary.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=SUMMARY_COLUMNS)
+        writer.writeheader()
+        for summary in summaries:
+            row = {column: summary.get(field) for column, field in zip(SUMMARY_COLUMNS, SUMMARY_FIELDS)}
+            writer.writerow({**row, "Overload Pay": format_cents(summary["Overload Pay Cents"])})
+
+        processed = [summary for summary in summaries if summary["Status"] == "OK"]
+        writer.writerow({
+            "School": "DISTRICT TOTAL",
+            "Courses": sum(summary["Courses"] for summary in processed),
+            "Staff": sum(summary["Staff"] for summary in processed),
+            "Total Overload": sum(summary["Total Overload"] for summary in processed),
+            "Overload Pay": format_cents(sum(summary["Overload Pay Cents"] for summary in processed)),
+            "Quarantined": sum(summary["Quarantined"] for summary in summaries),
+            "Merged Rows": sum(summary["Merged Rows"] for summary in summaries),
+            "Seconds": round(sum(summary["Seconds"] for summary in summaries), 3),
+            "Status": f"{len(processed)} of {len(summaries)} files processed",
+        })
+    return path
+
+
+def write_rollup_reports(rollup, output_dir):
+    """Writes school, organization, staff and subject rollups across all periods in the rollup"""
+    paths = []
+    for filename, dimensions in ROLLUP_REPORTS.items():
+        totals = rollup.by(*dimensions)
+        totals["Overload Pay"] = [format_cents(cents) for cents in totals.pop("Overload Pay Cents").tolist()]
+        path = os.path.join(output_dir, filename)
+        totals.to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Calculate overload pay for a batch of school roster files.")
+    parser.add_argument("rosters", nargs="+", help="Roster CSV (optionally .gz/.zip), Excel, Parquet or Arrow files, directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", default="overload_reports", help="Directory for the reports")
+    parser.add_argument("--weeks", type=int, default=4, help="Number of weeks in the pay period")
+    parser.add_argument("--pay-rate", type=float, default=1.25, help="Pay per overload student per week")
+    parser.add_argument("--only-nonzero", action="store_true", help="Only list courses with overload in the reports")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count)")
+    parser.add_argument("--chunksize", type=int, default=None, help="Stream rosters in chunks of this many rows")
+    parser.add_argument("--rules", default=None, help="Course rules config file (default: course_rules.json)")
+    parser.add_argument("--district", default=None, help="District rule set to use (default: the config's default)")
+    parser.add_argument(
+        "--snapshot-dir", default=None,
+        help="Recalculate incrementally against the previous period saved here, write change reports "
+             "and save this period"
+    )
+    parser.add_argument("--store", default=None, help="Also write results to this Parquet result store")
+    parser.add_argument("--period", default=None, help="Pay period label for the result store, e.g. 2025-01")
+    parser.add_argument(
+        "--rollup", action="store_true",
+        help="Also write rollups by school, organization, staff and subject; with --store they cover every "
+             "stored period"
+    )
+    parser.add_argument(
+        "--metrics-jsonl", default=None,
+        help="Append per-stage timings, row counts and memory for every roster to this JSON-lines file"
+    )
+    parser.add_argument(
+        "--dedup", choices=sorted(DEDUP_POLICIES), default=None,
+        help="How to count sections listed more than once: first keeps the first row, max the row with the most "
+             "students, split divides the students across co-teachers (default: count every row)"
+    )
+    parser.add_argument(
+        "--dedup-key", nargs="+", default=None, metavar="COLUMN",
+        help=f"Columns identifying a section for --dedup (default: {', '.join(DEDUP_KEY)}, plus Section ID "
+             "when the roster has one)"
+    )
+    parser.add_argument("--xlsx", action="store_true", help="Also write each school's report as an Excel workbook")
+    parser.add_argument(
+        "--split-html", choices=["staff", "organization"], default=None,
+        help="Also write one HTML report per staff member or organization"
+    )
+    args = parser.parse_args(argv)
+
+    try:
+        get_rule_set(args.district, args.rules)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+    if args.store and not args.period:
+        parser.error("--store requires --period")
+
+    paths = find_rosters(args.rosters)
+    if not paths:
+        parser.error("no roster files found")
+    # Reports, snapshots and store partitions are named by school; two rosters of one school would overwrite them
+    conflicts = duplicate_school_names(paths)
+    if conflicts:
+        parser.error("rosters map to the same school name: " + "; ".join(
+            f"{school_name} ({', '.join(school_paths)})" for school_name, school_paths in conflicts.items()
+        ))
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    summaries = []
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        futures = {
+            executor.submit(
+                process_roster, path, args.output_dir, args.weeks, args.pay_rate, args.only_nonzero,
+                args.chunksize, args.split_html, args.district, args.rules, args.snapshot_dir,
+                args.store, args.period, args.metrics_jsonl, args.rollup, args.dedup, args.dedup_key, args.xlsx
+            ): path
+            for path in paths
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            path = futures[future]
+            try:
+                summary = future.result()
+            except Exception as e:
+                summary = {
+                    "School": school_name_from_filename(path), "Source File": path, "Courses": 0, "Staff": 0,
+                    "Total Overload": 0, "Overload Pay Cents": 0, "Quarantined": 0, "Merged Rows": 0, "Seconds": 0.0,
+                    "Status": f"Worker failed: {e}",
+                }
+            summaries.append(summary)
+
+            if summary["Status"] == "OK":
+                detail = f"{summary['Courses']} courses, {format_cents(summary['Overload Pay Cents'])}"
+                if summary["Quarantined"]:
+                    detail += f", {summary['Quarantined']} rows quarantined"
+                if summary["Merged Rows"]:
+                    detail += f", {summary['Merged Rows']} repeated-section rows merged"
+            else:
+                detail = summary["Status"]
+            print(f"[{done}/{len(paths)}] {summary['School']}: {detail} ({summary['Seconds']:.2f}s)", file=sys.stderr)
+
+    summaries.sort(key=lambda summary: summary["School"])
+    summary_path = write_district_summary(summaries, args.output_dir)
+    if args.rollup:
+        # The store's partials already include this run's periods, so history is never re-aggregated
+        if args.store:
+            rollup = ResultStore(args.store).read_rollup()
+        else:
+            rollup = Rollup.combine([summary["Rollup"] for summary in summaries if "Rollup" in summary])
+        write_rollup_reports(rollup, args.output_dir)
+    failed = sum(summary["Status"] != "OK" for summary in summaries)
+    print(
+        f"Processed {len(paths) - failed} of {len(paths)} rosters in {time.perf_counter() - start:.2f}s; "
+        f"district summary written to {summary_path}",
+        file=sys.stderr,
+    )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
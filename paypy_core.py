@@ -0,0 +1,1351 @@
+"""Overload pay calculation engine, without the Streamlit UI.
+
+Batch jobs, workers and scripts import OverloadPayCalculator and the roster
+readers from here; paypy.py is the Streamlit app built on top of it. pandas,
+numpy, pyarrow and the ZIP writer are only loaded once a roster is actually
+read or exported (see paypy_lazy), so importing this module is cheap.
+"""
+from paypy_lazy import lazy_import
+from paypy_rules import get_rule_set
+from paypy_metrics import TRACE_MEMORY, PipelineMetrics, emit_metrics
+from paypy_validation import RosterValidator, canonical_column
+from paypy_dedup import DEDUP_POLICIES, SECTION_ID, dedup_sections
+from paypy_format import format_cents, money_cells, safe_filename, unique_filename
+import os
+import base64
+import csv
+from datetime import datetime
+import io
+import html
+import re
+import hashlib
+import threading
+import logging
+from collections import OrderedDict
+from contextlib import contextmanager
+
+pd = lazy_import("pandas")
+np = lazy_import("numpy")
+
+logger = logging.getLogger(__name__)
+
+# Columns used from the roster; anything else in the export is ignored. A Section ID is only used for de-duplication
+REQUIRED_COLUMNS = ["Course Title", "Staff Name", "Total Students"]
+ROSTER_COLUMNS = ["Year", "Organization"] + REQUIRED_COLUMNS + [SECTION_ID]
+
+# Columns identifying a course section across pay periods
+SECTION_KEY = ["Year", "Organization", "Course Title", "Staff Name"]
+
+# Text columns of the processed rows stored as categoricals; values repeat across many rows
+CATEGORY_COLUMNS = ["Year", "Organization", "Course Title", "Staff Name"]
+
+# Period snapshots used for incremental recalculation, one file per school
+SNAPSHOT_DIR = os.environ.get(
+    "PAYPY_SNAPSHOT_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "snapshots")
+)
+
+# Roster file extensions by format. Formats are detected from the file contents first (see _roster_format),
+# so the extension only matters for Arrow IPC streams, which have no signature; anything else is read as CSV
+PARQUET_EXTENSIONS = (".parquet", ".pq")
+ARROW_EXTENSIONS = (".arrow", ".arrows", ".feather", ".ipc")
+XLSX_EXTENSIONS = (".xlsx", ".xlsm")
+COMPRESSED_CSV_EXTENSIONS = (".csv.gz", ".gz", ".zip")
+
+# pandas compression argument for each CSV variant
+CSV_COMPRESSION = {"csv": None, "csv.gz": "gzip", "csv.zip": "zip"}
+
+# Uploads larger than this are streamed in chunks instead of read all at once
+STREAMING_THRESHOLD_BYTES = 100 * 1024 * 1024
+STREAMING_CHUNK_ROWS = 200_000
+
+# Rows formatted at a time when writing the CSV, Excel and HTML exports
+EXPORT_BATCH_ROWS = 50_000
+
+# Excel number format for the pay columns
+XLSX_MONEY_FORMAT = '"$"#,##0.00'
+
+# HTML report templates, filled with str.format; text values are escaped before formatting
+_HTML_REPORT_START = """<!DOCTYPE html>
+<html>
+<head>
+    <title>{title}</title>
+    <style>
+        body {{ font-family: Arial, sans-serif; margin: 20px; line-height: 1.4; }}
+        h1, h2, h3 {{ color: #333; }}
+        table {{ border-collapse: collapse; width: 100%; margin-bottom: 30px; }}
+        th, td {{ border: 1px solid #ddd; padding: 8px; }}
+        th {{ background-color: #2c5f9b; color: white; font-weight: bold; text-align: left; }}
+        tr:nth-child(even) {{ background-color: #f2f2f2; }}
+        tr:hover {{ background-color: #ddd; }}
+        .total-row {{ font-weight: bold; background-color: #e6eeff !important; }}
+        .money {{ text-align: right; }}
+        .staff-section {{ margin-bottom: 30px; }}
+        .summary-table {{ width: 50%; margin: 20px 0; }}
+        .overload-highlight {{ background-color: #ffe6e6; }}
+        .notice {{ background-color: #e6f2ff; border: 1px solid #b3d9ff; padding: 10px; margin: 20px 0; border-radius: 5px; }}
+    </style>
+</head>
+<body>
+    <h1>{title}</h1>
+    <p>Report generated on {generated}</p>
+    
+    <div class="notice">
+        <h3>Calculation Parameters:</h3>
+        <p>Payment Period: <strong>{weeks}</strong></p>
+        <p>Pay Rate: <strong>${pay_rate:.2f}</strong> per overload student per week</p>
+        <p>Base Student thresholds: {thresholds}</p>
+    </div>
+"""
+
+_HTML_STAFF_START = """
+    <div class="staff-section">
+        <h3>{staff_name}</h3>
+        <table>
+            <thead>
+                <tr>
+                    <th>Year</th>
+                    <th>Organization</th>
+                    <th>Course Title</th>
+                    <th>Total Students</th>
+                    <th>Base Students</th>
+                    <th>Total Overload</th>
+                    <th>Overload Pay</th>
+                </tr>
+            </thead>
+            <tbody>
+"""
+
+_HTML_COURSE_ROW = """                <tr{highlight}><td>{year}</td><td>{organization}</td><td>{course_title}</td><td>{total_students}</td><td>{base_students}</td><td>{overload}</td><td class="money">{pay}</td></tr>
+"""
+
+_HTML_STAFF_END = """                <tr class="total-row">
+                    <td colspan="4">TOTAL</td>
+                    <td></td>
+                    <td>{overload}</td>
+                    <td class="money">{pay}</td>
+                </tr>
+            </tbody>
+        </table>
+    </div>
+"""
+
+_HTML_SUMMARY_START = """
+    <h2>Summary of Teacher Overload Pay</h2>
+    <table class="summary-table">
+        <thead>
+            <tr>
+                <th>Staff Name</th>
+                <th>Total Overload</th>
+                <th>Overload Pay</th>
+            </tr>
+        </thead>
+        <tbody>
+"""
+
+_HTML_SUMMARY_ROW = """            <tr{highlight}><td>{staff_name}</td><td>{overload}</td><td class="money">{pay}</td></tr>
+"""
+
+_HTML_REPORT_END = """            <tr class="total-row">
+                <td><strong>{total_label}</strong></td>
+                <td><strong>{overload}</strong></td>
+                <td class="money"><strong>{pay}</strong></td>
+            </tr>
+        </tbody>
+    </table>
+{merged}    
+    <div class="notice">
+        <p><strong>Notes:</strong></p>
+        <ul>
+            <li>This report only includes {subjects} courses with students &gt; 0</li>
+            <li>Rows highlighted in pink indicate courses with overload students</li>
+            <li>Payment calculation: Overload Students &times; ${pay_rate:.2f} &times; {weeks}</li>
+        </ul>
+    </div>
+</body>
+</html>
+"""
+
+# Sections merged by the de-duplication policy, listed after the summary in full reports
+_HTML_MERGED_START = """
+    <h2>Duplicate Sections Merged</h2>
+    <p>{description}</p>
+    <table class="summary-table">
+        <thead>
+            <tr>{header}</tr>
+        </thead>
+        <tbody>
+"""
+
+_HTML_MERGED_ROW = """            <tr>{cells}</tr>
+"""
+
+_HTML_MERGED_END = """        </tbody>
+    </table>
+"""
+
+# Number of parsed rosters and priced results kept by the Streamlit result cache
+RESULT_CACHE_ENTRIES = 16
+
+
+def content_hash(file):
+    """Returns a SHA-256 hex digest of an uploaded file, a file path or a file-like object"""
+    digest = hashlib.sha256()
+    if hasattr(file, "getvalue"):
+        content = file.getvalue()
+        digest.update(content.encode() if isinstance(content, str) else content)
+    elif isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+    else:
+        position = file.tell()
+        while True:
+            block = file.read(1024 * 1024)
+            if not block:
+                break
+            digest.update(block.encode() if isinstance(block, str) else block)
+        file.seek(position)
+    return digest.hexdigest()
+
+
+def _peek(file, size):
+    """Returns the first bytes of a file path or file-like object, leaving a file-like object where it was"""
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as f:
+            return f.read(size)
+    position = file.tell()
+    head = file.read(size)
+    file.seek(position)
+    return head
+
+
+def _is_workbook(file):
+    """Tells an XLSX workbook from a zipped CSV; both are ZIP archives"""
+    import zipfile
+    
+    position = None if isinstance(file, (str, os.PathLike)) else file.tell()
+    try:
+        with zipfile.ZipFile(file) as archive:
+            return "xl/workbook.xml" in archive.namelist()
+    finally:
+        if position is not None:
+            file.seek(position)
+
+
+def _roster_format(file):
+    """Detects the roster format from the file's signature, then its name: csv, csv.gz, csv.zip, xlsx, parquet or arrow"""
+    head = _peek(file, 8)
+    if isinstance(head, bytes):
+        if head.startswith(b"PAR1"):
+            return "parquet"
+        if head.startswith(b"ARROW1") or head.startswith(b"\xff\xff\xff\xff"):
+            # An Arrow IPC file, or a stream starting with its first message's continuation marker
+            return "arrow"
+        if head.startswith(b"\x1f\x8b"):
+            return "csv.gz"
+        if head.startswith(b"PK\x03\x04"):
+            return "xlsx" if _is_workbook(file) else "csv.zip"
+    
+    name = file if isinstance(file, (str, os.PathLike)) else getattr(file, "name", "")
+    extension = os.path.splitext(os.fspath(name).lower())[1]
+    if extension in ARROW_EXTENSIONS:
+        return "arrow"
+    if extension in PARQUET_EXTENSIONS:
+        return "parquet"
+    return "csv"
+
+
+def _import_openpyxl():
+    """Imports openpyxl, which is only needed for Excel rosters and exports"""
+    try:
+        import openpyxl
+    except ImportError as e:
+        raise ImportError("Reading or writing Excel files requires openpyxl (pip install openpyxl)") from e
+    return openpyxl
+
+
+def _iter_xlsx_chunks(file, chunksize, columns=None):
+    """Yields the first sheet of a workbook in DataFrames of at most chunksize rows, reading it row by row"""
+    if isinstance(file, (str, os.PathLike)):
+        # openpyxl refuses paths without an Excel extension; the format was already detected from the contents
+        with open(file, "rb") as f:
+            yield from _iter_xlsx_chunks(f, chunksize, columns)
+        return
+    
+    openpyxl = _import_openpyxl()
+    # Read-only mode streams the sheet XML instead of loading every cell into memory
+    workbook = openpyxl.load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        header = ["" if name is None else str(name).strip() for name in header]
+        keep = [index for index, name in enumerate(header) if name and _wanted_column(name, columns)]
+        names = [header[index] for index in keep]
+        
+        chunk, yielded = [], False
+        for row in rows:
+            values = [row[index] if index < len(row) else None for index in keep]
+            if all(value is None for value in values):
+                # Formatted but empty rows at the end of a sheet
+                continue
+            chunk.append(values)
+            if len(chunk) == chunksize:
+                yield pd.DataFrame.from_records(chunk, columns=names)
+                chunk, yielded = [], True
+        if chunk or not yielded:
+            # An empty sheet still yields its header, so missing columns are reported
+            yield pd.DataFrame.from_records(chunk, columns=names)
+    finally:
+        workbook.close()
+
+
+def _import_pyarrow():
+    """Imports pyarrow, which is only needed for Parquet and Arrow files"""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Reading Parquet or Arrow files requires pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def _arrow_source(file):
+    """Memory-maps a file path, or wraps an uploaded file's bytes, for the pyarrow readers"""
+    pa = _import_pyarrow()
+    if isinstance(file, (str, os.PathLike)):
+        return pa.memory_map(os.fspath(file), "r")
+    if hasattr(file, "getvalue"):
+        return pa.BufferReader(file.getvalue())
+    return pa.PythonFile(file, mode="r")
+
+
+def _wanted_column(name, columns):
+    """Whether a roster column is kept: no column list, a listed column, or a header alias of one"""
+    return columns is None or name in columns or canonical_column(name) in columns
+
+
+def _open_arrow_batches(file, columns=None):
+    """Returns the record batches of an Arrow IPC file or stream, restricted to the given columns"""
+    pa = _import_pyarrow()
+    source = _arrow_source(file)
+    try:
+        reader = pa.ipc.open_file(source)
+        batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        schema = reader.schema
+    except pa.ArrowInvalid:
+        source.seek(0)
+        reader = pa.ipc.open_stream(source)
+        batches = iter(reader)
+        schema = reader.schema
+    names = [name for name in schema.names if _wanted_column(name, columns)]
+    return schema, (batch.select(names) for batch in batches)
+
+
+def read_roster(file, columns=None):
+    """Reads a whole roster from CSV (plain, gzipped or zipped), XLSX, Parquet or Arrow IPC, keeping only the given columns if present"""
+    roster_format = _roster_format(file)
+    if roster_format in CSV_COMPRESSION:
+        return pd.read_csv(
+            file,
+            usecols=(lambda col: _wanted_column(col, columns)) if columns else None,
+            compression=CSV_COMPRESSION[roster_format]
+        )
+    if roster_format == "xlsx":
+        chunks = list(_iter_xlsx_chunks(file, EXPORT_BATCH_ROWS, columns))
+        return pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+    
+    pa = _import_pyarrow()
+    if roster_format == "parquet":
+        parquet_file = pa.parquet.ParquetFile(_arrow_source(file))
+        names = [name for name in parquet_file.schema_arrow.names if _wanted_column(name, columns)]
+        return parquet_file.read(columns=names).to_pandas()
+    
+    schema, batches = _open_arrow_batches(file, columns)
+    return pa.Table.from_batches(list(batches)).to_pandas() if schema.names else pd.DataFrame()
+
+
+def iter_roster_chunks(file, chunksize, columns=None):
+    """Yields a roster from CSV (plain, gzipped or zipped), XLSX, Parquet or Arrow IPC in DataFrames of at most chunksize rows"""
+    roster_format = _roster_format(file)
+    if roster_format in CSV_COMPRESSION:
+        yield from pd.read_csv(
+            file,
+            usecols=(lambda col: _wanted_column(col, columns)) if columns else None,
+            compression=CSV_COMPRESSION[roster_format],
+            chunksize=chunksize
+        )
+        return
+    if roster_format == "xlsx":
+        yield from _iter_xlsx_chunks(file, chunksize, columns)
+        return
+    
+    pa = _import_pyarrow()
+    if roster_format == "parquet":
+        parquet_file = pa.parquet.ParquetFile(_arrow_source(file))
+        names = [name for name in parquet_file.schema_arrow.names if _wanted_column(name, columns)]
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=names):
+            yield batch.to_pandas()
+        return
+    
+    _, batches = _open_arrow_batches(file, columns)
+    for batch in batches:
+        for offset in range(0, batch.num_rows, chunksize):
+            yield batch.slice(offset, chunksize).to_pandas()
+
+
+def load_snapshot(path):
+    """Loads a period snapshot written by OverloadPayCalculator.save_snapshot, or None if there is none"""
+    if not os.path.exists(path):
+        return None
+    snapshot = pd.read_pickle(path)
+    
+    # Snapshots saved before pay was stored in cents hold dollar amounts
+    for key in ["processed_df", "staff_totals"]:
+        frame = snapshot[key]
+        if "Overload Pay" in frame.columns:
+            cents = (frame["Overload Pay"] * 100).round().astype(np.int64)
+            snapshot[key] = frame.drop(columns="Overload Pay").assign(**{"Overload Pay Cents": cents})
+    return snapshot
+
+
+def snapshot_path(school_name, snapshot_dir=None):
+    """Returns the snapshot file used for a school's incremental runs"""
+    return os.path.join(snapshot_dir or SNAPSHOT_DIR, f"{safe_filename(school_name or 'School')}.pkl")
+
+
+def school_name_from_filename(filename):
+    """Derives a school name from a roster file name, e.g. lincoln_elementary_roster.csv -> Lincoln Elementary"""
+    name_without_ext, extension = os.path.splitext(os.path.basename(filename))
+    if extension.lower() in (".gz", ".zip"):
+        # roster.csv.gz -> roster
+        name_without_ext = os.path.splitext(name_without_ext)[0]
+    # Clean up common suffixes
+    for suffix in ["_roster", "_classes", "_data", "_overload"]:
+        name_without_ext = name_without_ext.replace(suffix, "")
+    return name_without_ext.replace("_", " ").title()
+
+
+def _csv_cells(values):
+    """Converts a column to CSV cell values, leaving missing values blank"""
+    cells = values.tolist()
+    missing = values.isna().to_numpy()
+    if missing.any():
+        for position in np.flatnonzero(missing).tolist():
+            cells[position] = ""
+    return cells
+
+
+def _key_text(values):
+    """Converts a section key column to text, blank when missing, so periods read with different types still match"""
+    codes, uniques = pd.factorize(values)
+    if pd.api.types.is_float_dtype(uniques.dtype) and (uniques % 1 == 0).all():
+        # A numeric Year with blanks is read as floats; 2024.0 must match 2024 and "2024"
+        uniques = uniques.astype(np.int64)
+    # Convert each distinct value once; code -1 (missing) takes the blank at the end
+    text = np.array([str(value) for value in uniques.tolist()] + [""], dtype=object)
+    return pd.Series(text[codes], dtype=object)
+
+
+def pay_table_cents(overload_values, pay_rate, num_weeks):
+    """Prices overload counts at a pay rate and number of weeks, each rounded to the cent"""
+    return np.array([
+        round(round(overload * pay_rate * num_weeks, 2) * 100)
+        for overload in overload_values.tolist()
+    ], dtype=np.int64)
+
+
+def _frame_bytes(frame):
+    """Returns the memory used by a DataFrame, including the contents of text columns"""
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+
+def compact_rows(frame):
+    """Stores repeated text as categoricals and counts in the smallest integer type that holds them"""
+    columns = {}
+    for col in frame.columns:
+        values = frame[col]
+        if col in CATEGORY_COLUMNS and (values.dtype == object or pd.api.types.is_string_dtype(values.dtype)):
+            values = values.astype("category")
+        elif pd.api.types.is_float_dtype(values.dtype) and values.notna().all() and (values % 1 == 0).all():
+            values = pd.to_numeric(values, downcast="integer")
+        elif pd.api.types.is_integer_dtype(values.dtype):
+            values = pd.to_numeric(values, downcast="integer")
+        columns[col] = values
+    return pd.DataFrame(columns, index=frame.index)
+
+
+def page_rows(rows, page, page_size, sort_by=None, descending=False):
+    """Returns one page (1-based) of rows, sorted by a column first if given"""
+    if sort_by:
+        rows = rows.sort_values(sort_by, ascending=not descending, kind="stable")
+    start = (page - 1) * page_size
+    return rows.iloc[start:start + page_size]
+
+
+def _html_cells(values):
+    """Converts a column to HTML-escaped cell text, leaving missing values blank"""
+    return [html.escape(str(value)) for value in _csv_cells(values)]
+
+
+class ResultCache:
+    """Size-bounded LRU cache for parsed rosters, priced results and exports"""
+    
+    def __init__(self, max_entries=RESULT_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+    
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+    
+    def __len__(self):
+        return len(self._entries)
+
+
+class OverloadPayCalculator:
+    def __init__(self, rules=None, metrics_hooks=None, trace_memory=None, dedup_policy=None, dedup_key=None):
+        # Course classification rules for the district
+        self.rules = rules or get_rule_set()
+        
+        # How sections listed more than once are counted (see paypy_dedup); None counts every row
+        if dedup_policy is not None and dedup_policy not in DEDUP_POLICIES:
+            raise ValueError(f"Unknown de-duplication policy: {dedup_policy}. Use {', '.join(DEDUP_POLICIES)}")
+        self.dedup_policy = dedup_policy
+        self.dedup_key = list(dedup_key) if dedup_key else None
+        
+        # Per-stage metrics of the latest run, passed to each hook after every run
+        self.metrics = None
+        self.metrics_hooks = list(metrics_hooks or [])
+        self.trace_memory = TRACE_MEMORY if trace_memory is None else trace_memory
+        
+        # Variables with default values
+        self.school_name = ""
+        self.num_weeks = 4
+        self.pay_rate = 1.25
+        self.show_only_nonzero = False
+        
+        # Data storage; pay is kept in integer cents
+        self.staff_totals = None
+        self.grand_total = {"total_overload": 0, "overload_pay_cents": 0, "overload_pay": 0.0}
+        self.file_hash = None
+        self.change_report = None
+        self.memory_stats = None
+        
+        # Row-level problems found while reading the roster, and the rows left out because of them
+        self.validation_errors = None
+        self.quarantined_rows = None
+        
+        # Sections listed more than once, and the rows merged under the de-duplication policy
+        self.dedup_summary = None
+    
+    def process_data(self, file, school_name, num_weeks, pay_rate, show_only_nonzero, chunksize=None, cache=None):
+        """Processes a roster and prices its relevant courses, recording per-stage metrics"""
+        return self._run(
+            school_name, self._process_data, file, school_name, num_weeks, pay_rate, show_only_nonzero, chunksize, cache
+        )
+    
+    def process_data_incremental(self, file, previous, school_name, num_weeks, pay_rate, show_only_nonzero,
+                                 chunksize=None):
+        """Processes a roster against the previous period's snapshot, reclassifying only changed or added sections"""
+        return self._run(
+            school_name, self._process_data_incremental, file, previous, school_name, num_weeks, pay_rate,
+            show_only_nonzero, chunksize
+        )
+    
+    def _run(self, school_name, process, *args):
+        """Runs a processing method with fresh metrics, logging failures and passing the metrics to the hooks"""
+        self.metrics = PipelineMetrics("process", school_name, self.trace_memory)
+        try:
+            success, message = process(*args)
+        except Exception as e:
+            logger.exception("Processing the roster for %s failed", school_name or "School")
+            success, message = False, f"An error occurred while processing the file: {str(e)}"
+        
+        self.metrics.finish("ok" if success else "failed", None if success else message)
+        emit_metrics(self.metrics, self.metrics_hooks)
+        return success, message
+    
+    @contextmanager
+    def export_stage(self, event):
+        """Times an export as its own metrics event and adds it to the latest run's stages"""
+        metrics = PipelineMetrics(event, self.school_name, self.trace_memory)
+        try:
+            with metrics.stage(event) as stage:
+                yield stage
+        except Exception as e:
+            metrics.finish("failed", str(e))
+            emit_metrics(metrics, self.metrics_hooks)
+            raise
+        
+        metrics.finish()
+        if self.metrics is not None:
+            self.metrics.stages[event] = metrics.stages[event]
+        emit_metrics(metrics, self.metrics_hooks)
+    
+    def _process_data(self, file, school_name, num_weeks, pay_rate, show_only_nonzero, chunksize=None, cache=None):
+        # Update instance variables
+        self.school_name = school_name
+        self.num_weeks = num_weeks
+        self.pay_rate = pay_rate
+        self.show_only_nonzero = show_only_nonzero
+        
+        # Reuse cached results for the same file contents when a cache is supplied
+        file_hash = None
+        if cache is not None:
+            with self.metrics.stage("hash"):
+                file_hash = content_hash(file)
+        self.file_hash = file_hash
+        pay_key = ("pay", file_hash, self.rules.fingerprint, self.dedup_policy, tuple(self.dedup_key or ()), num_weeks,
+                   pay_rate)
+        cached_pay = cache.get(pay_key) if cache is not None else None
+        if cached_pay is not None:
+            self.metrics.cache = "pay"
+            self.processed_df, self.staff_totals, self.grand_total, self.memory_stats, roster_reports = cached_pay
+            self._restore_roster_reports(roster_reports)
+            return True, self._success_message()
+        
+        courses_key = ("courses", file_hash, self.rules.fingerprint, self.dedup_policy, tuple(self.dedup_key or ()))
+        cached_courses = cache.get(courses_key) if cache is not None else None
+        if cached_courses is None:
+            success, result = self._load_courses(file, chunksize)
+            if not success:
+                return False, result
+            cached_courses = (result, self.memory_stats, self._roster_reports())
+            if cache is not None:
+                cache.put(courses_key, cached_courses)
+        else:
+            self.metrics.cache = "courses"
+        courses, memory_stats, roster_reports = cached_courses
+        self._restore_roster_reports(roster_reports)
+        
+        with self.metrics.stage("aggregate") as stage:
+            # Calculate overload pay
+            self.processed_df = courses.assign(**{"Overload Pay Cents": self.overload_pay_cents(courses["Total Overload"])})
+            
+            # Calculate staff totals and grand total
+            self.staff_totals, self.grand_total = self.calculate_totals(self.processed_df)
+            stage.add_rows(len(self.processed_df), len(self.staff_totals))
+        self.memory_stats = dict(memory_stats, processed_bytes=_frame_bytes(self.processed_df))
+        
+        if cache is not None:
+            cache.put(pay_key, (
+                self.processed_df, self.staff_totals, self.grand_total, self.memory_stats, self._roster_reports()
+            ))
+        
+        return True, self._success_message()
+    
+    def _roster_reports(self):
+        """Returns what reading the roster found (problems, quarantined and merged rows) for the result cache"""
+        return {
+            "validation_errors": self.validation_errors,
+            "quarantined_rows": self.quarantined_rows,
+            "dedup_summary": self.dedup_summary,
+        }
+    
+    def _restore_roster_reports(self, roster_reports):
+        for name, value in roster_reports.items():
+            setattr(self, name, value)
+    
+    def _success_message(self, *details):
+        """Reports success, noting how many roster rows were quarantined or merged"""
+        details = list(details)
+        if self.quarantined_rows is not None and len(self.quarantined_rows):
+            details.append(f"{len(self.quarantined_rows)} rows with errors quarantined")
+        if self.dedup_summary is not None and len(self.dedup_summary):
+            rows = int(self.dedup_summary["Rows"].sum())
+            details.append(f"{len(self.dedup_summary)} repeated sections merged from {rows} rows")
+        return "Data processed successfully" + (f" ({'; '.join(details)})" if details else "")
+    
+    def _process_data_incremental(self, file, previous, school_name, num_weeks, pay_rate, show_only_nonzero,
+                                  chunksize=None):
+        # Update instance variables
+        self.school_name = school_name
+        self.num_weeks = num_weeks
+        self.pay_rate = pay_rate
+        self.show_only_nonzero = show_only_nonzero
+        
+        # The exports are keyed by file contents, so an upload for the next period never reuses this one's
+        with self.metrics.stage("hash"):
+            self.file_hash = content_hash(file)
+        
+        success, result = self._read_sections(file, chunksize)
+        if not success:
+            return False, result
+        sections = result
+        
+        if previous is None:
+            # Without a previous period every section counts as added
+            no_rows = self.classify_courses(sections.iloc[:0]).assign(**{"Overload Pay Cents": 0})
+            previous = {
+                "rules": self.rules.fingerprint,
+                "num_weeks": num_weeks,
+                "pay_rate": pay_rate,
+                "processed_df": no_rows,
+                "staff_totals": self.calculate_totals(no_rows)[0],
+            }
+        same_rules = previous["rules"] == self.rules.fingerprint
+        same_pay = same_rules and previous["num_weeks"] == num_weeks and previous["pay_rate"] == pay_rate
+        
+        with self.metrics.stage("match") as stage:
+            # Match sections to the previous period by key; repeated keys are matched in file order
+            current_keys = self._section_keys(sections).assign(**{"Total Students": sections["Total Students"].to_numpy()})
+            previous_rows = previous["processed_df"].sort_index()
+            previous_keys = self._section_keys(previous_rows).assign(**{
+                "Previous Students": previous_rows["Total Students"].to_numpy(),
+                "Base Students": previous_rows["Base Students"].to_numpy()
+            })
+            matched = current_keys.merge(previous_keys, on=SECTION_KEY + ["_occurrence"], how="left", indicator=True)
+            removed = previous_keys.merge(current_keys, on=SECTION_KEY + ["_occurrence"], how="left", indicator=True)
+            removed = removed[removed["_merge"] == "left_only"]
+            
+            is_matched = (matched["_merge"] == "both").to_numpy()
+            is_changed = is_matched & (matched["Total Students"].to_numpy() != matched["Previous Students"].to_numpy())
+            unchanged = is_matched & ~is_changed & same_rules
+            stage.add_rows(len(sections), int(is_matched.sum()))
+        
+        with self.metrics.stage("classify") as stage:
+            # Reuse base students for unchanged sections and classify only the changed or added ones
+            base_students = np.empty(len(sections), dtype=np.int64)
+            base_students[unchanged] = matched["Base Students"].to_numpy()[unchanged]
+            if not unchanged.all():
+                base_students[~unchanged] = self.rules.base_students_for(sections["Course Title"][~unchanged])
+            courses = self.classify_courses(sections, base_students).sort_values("Staff Name")
+            self.memory_stats["uncompacted_bytes"] = _frame_bytes(courses) + 8 * len(courses)  # plus a float64 pay column
+            courses = compact_rows(courses)
+            self.processed_df = courses.assign(**{"Overload Pay Cents": self.overload_pay_cents(courses["Total Overload"])})
+            self.memory_stats["processed_bytes"] = _frame_bytes(self.processed_df)
+            stage.add_rows(int((~unchanged).sum()), len(courses))
+        
+        with self.metrics.stage("aggregate") as stage:
+            # Recalculate totals only for staff with changed, added or removed sections
+            if same_pay:
+                affected_staff = set(sections["Staff Name"][~unchanged]) | set(removed["Staff Name"])
+            else:
+                affected_staff = set(sections["Staff Name"]) | set(previous_rows["Staff Name"])
+            affected_totals, _ = self.calculate_totals(
+                self.processed_df[self.processed_df["Staff Name"].isin(affected_staff)]
+            )
+            previous_totals = previous["staff_totals"]
+            self.staff_totals = compact_rows(pd.concat(
+                [previous_totals[~previous_totals["Staff Name"].isin(affected_staff)], affected_totals],
+                ignore_index=True
+            ).sort_values("Staff Name", ignore_index=True))
+            self.grand_total = self._grand_total(self.staff_totals)
+            stage.add_rows(len(self.processed_df), len(affected_totals))
+        
+        with self.metrics.stage("change_report") as stage:
+            # Summarize which teachers' pay moved
+            section_changes = pd.DataFrame({
+                "Sections Added": pd.Series(sections["Staff Name"][~is_matched]).value_counts(),
+                "Sections Changed": pd.Series(sections["Staff Name"][is_changed]).value_counts(),
+                "Sections Removed": removed["Staff Name"].astype(object).value_counts()
+            })
+            self.change_report = self._change_report(previous_totals, affected_totals, section_changes)
+            stage.add_rows(len(affected_totals), len(self.change_report))
+        
+        return True, self._success_message(f"{int((~unchanged).sum())} of {len(sections)} sections recalculated")
+    
+    @staticmethod
+    def _section_keys(rows):
+        """Returns the section key columns as text plus an occurrence number for repeated keys"""
+        keys = pd.DataFrame({col: _key_text(rows[col]) for col in SECTION_KEY})
+        return keys.assign(_occurrence=keys.groupby(SECTION_KEY, dropna=False, sort=False).cumcount())
+    
+    @staticmethod
+    def _change_report(previous_totals, affected_totals, section_changes):
+        """Lists staff whose overload pay or sections changed since the previous period"""
+        previous_totals = previous_totals.set_index("Staff Name")
+        current_totals = affected_totals.set_index("Staff Name")
+        staff = current_totals.index.union(section_changes.index)
+        report = pd.DataFrame({
+            "Previous Overload": previous_totals["Total Overload"].reindex(staff, fill_value=0),
+            "Current Overload": current_totals["Total Overload"].reindex(staff, fill_value=0),
+        }, index=staff)
+        
+        # Compare pay in integer cents, then report it in dollars
+        previous_cents = previous_totals["Overload Pay Cents"].reindex(staff, fill_value=0).astype(np.int64)
+        current_cents = current_totals["Overload Pay Cents"].reindex(staff, fill_value=0).astype(np.int64)
+        report["Previous Pay"] = previous_cents / 100
+        report["Current Pay"] = current_cents / 100
+        report["Pay Change"] = (current_cents - previous_cents) / 100
+        report = report.join(section_changes).fillna({col: 0 for col in section_changes.columns})
+        report[list(section_changes.columns)] = report[list(section_changes.columns)].astype(int)
+        
+        changed = (current_cents != previous_cents) | (report[list(section_changes.columns)].sum(axis=1) > 0)
+        report = report[changed].rename_axis("Staff Name").reset_index()
+        return report
+    
+    def save_snapshot(self, path):
+        """Saves this period's processed rows and totals for the next incremental run"""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        pd.to_pickle({
+            "school_name": self.school_name,
+            "rules": self.rules.fingerprint,
+            "num_weeks": self.num_weeks,
+            "pay_rate": self.pay_rate,
+            "processed_df": self.processed_df,
+            "staff_totals": self.staff_totals,
+        }, path)
+    
+    @classmethod
+    def calculate_totals(cls, processed_df):
+        """Returns per-staff totals and the grand total for a set of processed rows"""
+        staff_totals = processed_df.groupby("Staff Name", observed=True).agg({
+            "Total Overload": "sum",
+            "Overload Pay Cents": "sum"
+        }).reset_index()
+        staff_totals = compact_rows(staff_totals)
+        return staff_totals, cls._grand_total(staff_totals)
+    
+    @staticmethod
+    def _grand_total(staff_totals):
+        """Sums the staff totals; pay is summed in integer cents so there is no rounding drift"""
+        overload_pay_cents = int(staff_totals["Overload Pay Cents"].sum())
+        return {
+            "total_overload": staff_totals["Total Overload"].sum(),
+            "overload_pay_cents": overload_pay_cents,
+            "overload_pay": overload_pay_cents / 100
+        }
+    
+    def memory_report(self):
+        """Returns the memory used by the roster, course rows and staff totals before and after compaction"""
+        if not self.memory_stats:
+            return None
+        
+        stats = self.memory_stats
+        report = pd.DataFrame([
+            ["Raw roster (released after processing)", stats["roster_bytes"], 0],
+            ["Course rows", stats["uncompacted_bytes"], stats["processed_bytes"]],
+        ], columns=["Data", "Before (bytes)", "After (bytes)"])
+        report.loc[len(report)] = ["Total", report["Before (bytes)"].sum(), report["After (bytes)"].sum()]
+        report["Saved (bytes)"] = report["Before (bytes)"] - report["After (bytes)"]
+        return report
+    
+    def filter_rows(self, staff=None, organizations=None, subjects=None):
+        """Returns the processed rows for the selected staff, organizations and subjects (all if none selected)"""
+        rows = self.processed_df
+        mask = np.ones(len(rows), dtype=bool)
+        if self.show_only_nonzero:
+            mask &= rows["Total Overload"].to_numpy() > 0
+        if staff:
+            mask &= rows["Staff Name"].astype(str).isin(staff).to_numpy()
+        if organizations:
+            mask &= rows["Organization"].astype(str).isin(organizations).to_numpy()
+        if subjects:
+            # Match each distinct course title once against the selected subject patterns
+            pattern = re.compile("|".join(re.escape(subject) for subject in subjects), re.IGNORECASE)
+            codes, titles = pd.factorize(rows["Course Title"])
+            matches = np.array([isinstance(title, str) and pattern.search(title) is not None for title in titles] + [False])
+            mask &= matches[codes]
+        return rows[mask]
+    
+    def _load_courses(self, file, chunksize=None):
+        """Reads the roster and returns the relevant courses with base students and overload, sorted by Staff Name"""
+        success, result = self._read_sections(file, chunksize)
+        if not success:
+            return False, result
+        
+        with self.metrics.stage("classify") as stage:
+            # Sort by Staff Name, then store the rows compactly
+            courses = self.classify_courses(result).sort_values("Staff Name")
+            self.memory_stats["uncompacted_bytes"] = _frame_bytes(courses) + 8 * len(courses)  # plus a float64 pay column
+            courses = compact_rows(courses)
+            stage.add_rows(len(result), len(courses))
+        return True, courses
+    
+    def _read_sections(self, file, chunksize=None):
+        """Reads the roster and returns the relevant course sections in file order"""
+        self.memory_stats = {"roster_bytes": 0}
+        
+        # Rows with bad values are quarantined (see paypy_validation) and the rest of the file is processed;
+        # only the courses that are priced are checked for duplicates
+        validator = RosterValidator(REQUIRED_COLUMNS, duplicate_mask=self.course_mask)
+        try:
+            success, result = self._read_valid_sections(file, validator, chunksize)
+        finally:
+            self.validation_errors = validator.errors()
+            self.quarantined_rows = validator.quarantined()
+        if not success:
+            return False, result
+        
+        # Sections listed more than once are merged under the de-duplication policy, if one is set
+        self.dedup_summary = None
+        if self.dedup_policy is None:
+            return True, result.drop(columns=[SECTION_ID], errors="ignore")
+        with self.metrics.stage("dedup") as stage:
+            sections, self.dedup_summary = dedup_sections(result, self.dedup_policy, self.dedup_key)
+            stage.add_rows(len(result), len(sections))
+        return True, sections
+    
+    def _read_valid_sections(self, file, validator, chunksize=None):
+        """Reads, validates and filters the roster, in chunks if a chunksize is given"""
+        if chunksize:
+            # Stream the roster in bounded chunks and keep only the relevant course rows
+            section_chunks = []
+            chunks = iter_roster_chunks(file, chunksize, columns=ROSTER_COLUMNS)
+            while True:
+                with self.metrics.stage("parse") as stage:
+                    chunk = next(chunks, None)
+                    if chunk is not None:
+                        stage.add_rows(rows_out=len(chunk))
+                if chunk is None:
+                    break
+                
+                missing_cols = validator.missing_columns(chunk.columns)
+                if missing_cols:
+                    return False, f"The roster file is missing required columns: {', '.join(missing_cols)}"
+                
+                self.memory_stats["roster_bytes"] = max(self.memory_stats["roster_bytes"], _frame_bytes(chunk))
+                with self.metrics.stage("validate") as stage:
+                    rows_in = len(chunk)
+                    chunk = validator.validate(chunk)
+                    stage.add_rows(rows_in, len(chunk))
+                
+                with self.metrics.stage("filter") as stage:
+                    relevant_courses = chunk[self.course_mask(chunk)]
+                    if not relevant_courses.empty:
+                        section_chunks.append(self.section_rows(relevant_courses))
+                    stage.add_rows(len(chunk), len(relevant_courses))
+            
+            if not section_chunks:
+                return False, f"No {self.rules.subject_text()} courses with students > 0 found in the file."
+            
+            return True, pd.concat(section_chunks, ignore_index=True)
+        
+        # Read the roster file; the raw frame is released once the relevant rows are selected
+        with self.metrics.stage("parse") as stage:
+            roster = read_roster(file, columns=ROSTER_COLUMNS)
+            stage.add_rows(rows_out=len(roster))
+        self.memory_stats["roster_bytes"] = _frame_bytes(roster)
+        
+        # Check required columns
+        missing_cols = validator.missing_columns(roster.columns)
+        
+        if missing_cols:
+            return False, f"The roster file is missing required columns: {', '.join(missing_cols)}"
+        
+        with self.metrics.stage("validate") as stage:
+            rows_in = len(roster)
+            roster = validator.validate(roster)
+            stage.add_rows(rows_in, len(roster))
+        
+        # Filter for required courses and students > 0
+        with self.metrics.stage("filter") as stage:
+            relevant_courses = roster[self.course_mask(roster)]
+            stage.add_rows(len(roster), len(relevant_courses))
+            
+            if relevant_courses.empty:
+                return False, f"No {self.rules.subject_text()} courses with students > 0 found in the file."
+            
+            return True, self.section_rows(relevant_courses)
+    
+    def course_mask(self, data):
+        """Selects courses in the rule set's subjects with students > 0"""
+        return (data["Total Students"] > 0) & self.rules.subject_mask(data["Course Title"])
+    
+    @staticmethod
+    def section_rows(courses):
+        """Keeps the roster columns used in the reports, filling in a blank Year and Organization if missing"""
+        courses = courses.reset_index(drop=True)
+        sections = pd.DataFrame({
+            "Year": courses["Year"] if "Year" in courses.columns else "",
+            "Organization": courses["Organization"] if "Organization" in courses.columns else "",
+            "Course Title": courses["Course Title"],
+            "Staff Name": courses["Staff Name"],
+            "Total Students": courses["Total Students"]
+        })
+        if SECTION_ID in courses.columns:
+            # Kept until the de-duplication stage, which drops it
+            sections[SECTION_ID] = courses[SECTION_ID]
+        return sections
+    
+    def classify_courses(self, sections, base_students=None):
+        """Determines base students (unless already known) and overload for the relevant course sections"""
+        # Classify each distinct course title once, then broadcast the tiers back to the rows
+        if base_students is None:
+            base_students = self.rules.base_students_for(sections["Course Title"])
+        
+        # Calculate overload
+        total_students = sections["Total Students"].to_numpy()
+        total_overload = np.maximum(total_students - base_students, 0)
+        
+        return sections.assign(**{
+            "Base Students": base_students,
+            "Total Overload": total_overload
+        })
+    
+    def overload_pay_cents(self, total_overload):
+        """Prices each overload count at the current pay rate and number of weeks, in integer cents"""
+        # Price each distinct overload count once, rounded to the cent
+        overload_values, overload_codes = np.unique(total_overload.to_numpy(), return_inverse=True)
+        pay_table = pay_table_cents(overload_values, self.pay_rate, self.num_weeks)
+        return pd.to_numeric(pay_table[overload_codes.reshape(-1)], downcast="integer")
+    
+    def get_download_link_csv(self):
+        """Generates a download link for the CSV export"""
+        csv_bytes = self.get_csv_report_bytes()
+        if csv_bytes is None:
+            return None
+        
+        b64 = base64.b64encode(csv_bytes).decode()
+        filename = f"{self.school_name or 'School'}_Overload_Pay.csv"
+        href = f'<a href="data:file/csv;base64,{b64}" download="{filename}">Download CSV File</a>'
+        return href
+    
+    def get_csv_report_bytes(self):
+        """Returns the CSV export as UTF-8 bytes, e.g. for st.download_button"""
+        if not hasattr(self, 'processed_df'):
+            return None
+        
+        buffer = io.BytesIO()
+        stream = io.TextIOWrapper(buffer, encoding="utf-8", newline="")
+        self.write_csv_report(stream)
+        stream.detach()
+        return buffer.getvalue()
+    
+    def write_csv_report(self, stream):
+        """Writes the CSV export to a text stream with a TOTAL row after each staff member"""
+        if not hasattr(self, 'processed_df'):
+            return False
+        
+        with self.export_stage("csv_export") as stage:
+            stage.add_rows(len(self.processed_df), self._write_csv_rows(stream))
+        return True
+    
+    def _write_csv_rows(self, stream):
+        """Writes the CSV export and returns the number of course rows written"""
+        export_data = self._export_rows()
+        columns = list(export_data.columns)
+        
+        writer = csv.writer(stream, lineterminator="\n")
+        writer.writerow(["Overload Pay" if col == "Overload Pay Cents" else col for col in columns])
+        for _, rows in self._iter_staff_layout(
+            export_data,
+            lambda batch: list(zip(*[
+                money_cells(batch[col]) if col == "Overload Pay Cents" else _csv_cells(batch[col])
+                for col in columns
+            ])),
+            zip(_csv_cells(self.staff_totals["Total Overload"]), money_cells(self.staff_totals["Overload Pay Cents"])),
+            blank=""
+        ):
+            writer.writerows(rows)
+        
+        return len(export_data)
+    
+    def _export_rows(self):
+        """Returns the processed rows included in the CSV and Excel exports"""
+        # Filter data if nonzero option is selected
+        export_data = self.processed_df
+        if self.show_only_nonzero:
+            export_data = export_data[export_data["Total Overload"] > 0]
+        return export_data
+    
+    def _iter_staff_layout(self, export_data, format_batch, staff_total_cells, blank):
+        """Yields ("rows" | "total" | "blank", rows) blocks of the staff layout shared by the CSV and Excel exports"""
+        columns = list(export_data.columns)
+        title_col = columns.index("Course Title")
+        staff_col = columns.index("Staff Name")
+        overload_col = columns.index("Total Overload")
+        pay_col = columns.index("Overload Pay Cents")
+        blank_row = [blank] * len(columns)
+        
+        # Staff totals formatted once and looked up by name
+        staff_totals = dict(zip(self.staff_totals["Staff Name"], staff_total_cells))
+        
+        # The export data is sorted by Staff Name, so each staff member's rows are contiguous
+        staff_codes = pd.factorize(export_data["Staff Name"])[0]
+        last_of_staff = np.append(staff_codes[1:] != staff_codes[:-1], True)
+        staff_names = export_data["Staff Name"].to_numpy()
+        
+        # Format the rows in bounded batches, adding TOTAL and blank rows at each staff change
+        num_rows = len(export_data)
+        for batch_start in range(0, num_rows, EXPORT_BATCH_ROWS):
+            batch = export_data.iloc[batch_start:batch_start + EXPORT_BATCH_ROWS]
+            rows = format_batch(batch)
+            
+            written = 0
+            for end in np.flatnonzero(last_of_staff[batch_start:batch_start + len(rows)]) + 1:
+                yield "rows", rows[written:end]
+                written = end
+                
+                # Add total row for this staff
+                position = batch_start + end - 1
+                total_row = list(blank_row)
+                total_row[title_col] = "TOTAL"
+                total_row[staff_col] = rows[end - 1][staff_col]
+                total_row[overload_col], total_row[pay_col] = staff_totals.get(staff_names[position], (blank, blank))
+                yield "total", [total_row]
+                
+                # Add blank row between staff
+                if position < num_rows - 1:
+                    yield "blank", [blank_row]
+            yield "rows", rows[written:]
+    
+    def get_xlsx_report_bytes(self):
+        """Returns the Excel export as bytes, e.g. for st.download_button"""
+        if not hasattr(self, 'processed_df'):
+            return None
+        
+        buffer = io.BytesIO()
+        self.write_xlsx_report(buffer)
+        return buffer.getvalue()
+    
+    def write_xlsx_report(self, stream):
+        """Writes the Excel export, laid out like the CSV export, to a binary stream or file path"""
+        if not hasattr(self, 'processed_df'):
+            return False
+        
+        with self.export_stage("xlsx_export") as stage:
+            stage.add_rows(len(self.processed_df), self._write_xlsx_rows(stream))
+        return True
+    
+    def _write_xlsx_rows(self, stream):
+        """Writes the Excel export in write-only mode and returns the number of course rows written"""
+        openpyxl = _import_openpyxl()
+        from openpyxl.cell import WriteOnlyCell
+        from openpyxl.styles import Font, NamedStyle
+        
+        export_data = self._export_rows()
+        columns = list(export_data.columns)
+        pay_col = columns.index("Overload Pay Cents")
+        
+        # Write-only workbooks stream rows to disk as they are appended, so memory stays flat with report size
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet(safe_filename(self.school_name or "Overload Pay")[:31])
+        for style in (
+            NamedStyle("Overload Pay", number_format=XLSX_MONEY_FORMAT),
+            NamedStyle("Overload Total", font=Font(bold=True)),
+            NamedStyle("Overload Pay Total", number_format=XLSX_MONEY_FORMAT, font=Font(bold=True)),
+        ):
+            workbook.add_named_style(style)
+        
+        def styled(value, style):
+            styled_cell = WriteOnlyCell(sheet, value=value)
+            styled_cell.style = style
+            return styled_cell
+        
+        def typed_cells(values):
+            return values.astype(object).where(values.notna(), None).tolist()
+        
+        # Course rows share one money-formatted cell: append() writes each row out before the next reuses it
+        pay_cell = styled(None, "Overload Pay")
+        
+        sheet.append([styled("Overload Pay" if col == "Overload Pay Cents" else col, "Overload Total") for col in columns])
+        for kind, rows in self._iter_staff_layout(
+            export_data,
+            lambda batch: list(zip(*[
+                (batch[col] / 100).tolist() if col == "Overload Pay Cents" else typed_cells(batch[col])
+                for col in columns
+            ])),
+            zip(self.staff_totals["Total Overload"].tolist(), (self.staff_totals["Overload Pay Cents"] / 100).tolist()),
+            blank=None
+        ):
+            for row in rows:
+                row = list(row)
+                if kind == "total":
+                    # One TOTAL row per staff member, so styling its few cells individually is cheap
+                    row = [
+                        None if value is None else styled(value, "Overload Pay Total" if index == pay_col else "Overload Total")
+                        for index, value in enumerate(row)
+                    ]
+                elif row[pay_col] is not None:
+                    pay_cell.value = row[pay_col]
+                    row[pay_col] = pay_cell
+                sheet.append(row)
+        
+        workbook.save(stream)
+        return len(export_data)
+    
+    def get_download_link_html(self):
+        """Generates a download link for the HTML report"""
+        html_bytes = self.get_html_report_bytes()
+        if html_bytes is None:
+            return None
+        
+        b64 = base64.b64encode(html_bytes).decode()
+        filename = f"{self.school_name or 'School'}_Overload_Pay_Report.html"
+        href = f'<a href="data:text/html;base64,{b64}" download="{filename}">Download HTML Report</a>'
+        return href
+    
+    def get_html_report_bytes(self):
+        """Returns the HTML report as UTF-8 bytes, e.g. for st.download_button"""
+        if not hasattr(self, 'processed_df'):
+            return None
+        
+        buffer = io.BytesIO()
+        with self.export_stage("html_export") as stage:
+            for chunk in self.iter_html_report():
+                buffer.write(chunk.encode())
+            stage.add_rows(len(self.processed_df))
+        return buffer.getvalue()
+    
+    def write_html_report(self, stream):
+        """Writes the HTML report to a text stream"""
+        if not hasattr(self, 'processed_df'):
+            return False
+        
+        with self.export_stage("html_export") as stage:
+            for chunk in self.iter_html_report():
+                stream.write(chunk)
+            stage.add_rows(len(self.processed_df))
+        return True
+    
+    def iter_html_reports(self, split_by):
+        """Yields (name, chunks) pairs with one HTML report per staff member or organization"""
+        column = {"staff": "Staff Name", "organization": "Organization"}[split_by]
+        for name, rows in self.processed_df.groupby(column, sort=True, dropna=False, observed=True):
+            name = "" if pd.isna(name) else str(name)
+            yield name, self.iter_html_report(rows, subtitle=name or "Unassigned")
+    
+    def get_html_reports_zip(self, split_by):
+        """Returns a ZIP archive with one HTML report per staff member or organization"""
+        if not hasattr(self, 'processed_df'):
+            return None
+        
+        # zipfile pulls in the compression modules, so it is only imported for this export
+        import zipfile
+        
+        buffer = io.BytesIO()
+        with self.export_stage("html_zip_export") as stage:
+            with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+                used_names = set()
+                for name, chunks in self.iter_html_reports(split_by):
+                    filename = unique_filename(f"{safe_filename(name or 'Unassigned')}.html", used_names)
+                    with archive.open(filename, "w") as member:
+                        for chunk in chunks:
+                            member.write(chunk.encode())
+            stage.add_rows(len(self.processed_df), len(used_names))
+        return buffer.getvalue()
+    
+    def iter_html_report(self, rows=None, subtitle=None):
+        """Yields the HTML report in chunks: one per staff section plus header and summary"""
+        full_report = rows is None
+        if full_report:
+            rows = self.processed_df
+            staff_totals, grand_total = self.staff_totals, self.grand_total
+            total_label = "DISTRICT TOTAL"
+        else:
+            staff_totals, grand_total = self.calculate_totals(rows)
+            total_label = "TOTAL"
+        
+        # Filter data if nonzero option is selected
+        display_data = rows
+        if self.show_only_nonzero:
+            display_data = display_data[display_data["Total Overload"] > 0]
+        
+        title = f"{self.school_name or 'School'} Overload Pay Report"
+        if subtitle:
+            title = f"{title} - {subtitle}"
+        weeks = f"{self.num_weeks} week{'s' if self.num_weeks != 1 else ''}"
+        
+        yield _HTML_REPORT_START.format(
+            title=html.escape(title),
+            generated=datetime.now().strftime('%Y-%m-%d at %H:%M:%S'),
+            weeks=weeks,
+            pay_rate=self.pay_rate,
+            thresholds=html.escape(self.rules.threshold_text()),
+        )
+        
+        # Add staff sections in bounded batches; rows are sorted by Staff Name so each section is contiguous
+        section = []
+        current_staff = None
+        staff_total_overload = 0
+        staff_total_pay = 0
+        for batch_start in range(0, len(display_data), EXPORT_BATCH_ROWS):
+            batch = display_data.iloc[batch_start:batch_start + EXPORT_BATCH_ROWS]
+            for year, organization, course_title, staff_name, total_students, base_students, overload, pay in zip(
+                _html_cells(batch["Year"]),
+                _html_cells(batch["Organization"]),
+                _html_cells(batch["Course Title"]),
+                _html_cells(batch["Staff Name"]),
+                _html_cells(batch["Total Students"]),
+                _html_cells(batch["Base Students"]),
+                batch["Total Overload"].tolist(),
+                batch["Overload Pay Cents"].tolist()
+            ):
+                if staff_name != current_staff:
+                    if current_staff is not None:
+                        section.append(_HTML_STAFF_END.format(
+                            overload=staff_total_overload, pay=format_cents(staff_total_pay)
+                        ))
+                        yield "".join(section)
+                        section = []
+                    section.append(_HTML_STAFF_START.format(staff_name=staff_name))
+                    current_staff = staff_name
+                    staff_total_overload = 0
+                    staff_total_pay = 0
+                
+                staff_total_overload += overload
+                staff_total_pay += pay
+                section.append(_HTML_COURSE_ROW.format(
+                    highlight=' class="overload-highlight"' if overload > 0 else '',
+                    year=year,
+                    organization=organization,
+                    course_title=course_title,
+                    total_students=total_students,
+                    base_students=base_students,
+                    overload=overload,
+                    pay=format_cents(pay)
+                ))
+        
+        if current_staff is not None:
+            section.append(_HTML_STAFF_END.format(overload=staff_total_overload, pay=format_cents(staff_total_pay)))
+            yield "".join(section)
+        
+        # Add summary table and grand total
+        summary = [_HTML_SUMMARY_START]
+        for staff_name, overload, pay in zip(
+            _html_cells(staff_totals["Staff Name"]),
+            staff_totals["Total Overload"].tolist(),
+            staff_totals["Overload Pay Cents"].tolist()
+        ):
+            summary.append(_HTML_SUMMARY_ROW.format(
+                highlight=' class="overload-highlight"' if overload > 0 else '',
+                staff_name=staff_name,
+                overload=int(overload),
+                pay=format_cents(pay)
+            ))
+        summary.append(_HTML_REPORT_END.format(
+            total_label=total_label,
+            overload=int(grand_total["total_overload"]),
+            pay=format_cents(grand_total["overload_pay_cents"]),
+            weeks=weeks,
+            pay_rate=self.pay_rate,
+            subjects=html.escape(self.rules.subject_text("and")),
+            merged=self._html_merged_sections() if full_report else ""
+        ))
+        yield "".join(summary)
+    
+    def _html_merged_sections(self):
+        """Returns the HTML table of sections merged by the de-duplication policy, or an empty string"""
+        if self.dedup_summary is None or self.dedup_summary.empty:
+            return ""
+        
+        merged = [_HTML_MERGED_START.format(
+            description=html.escape(
+                f"Sections listed more than once in the roster were counted once: {DEDUP_POLICIES[self.dedup_policy]}."
+            ),
+            header="".join(f"<th>{html.escape(col)}</th>" for col in self.dedup_summary.columns)
+        )]
+        columns = [_html_cells(self.dedup_summary[col]) for col in self.dedup_summary.columns]
+        for cells in zip(*columns):
+            merged.append(_HTML_MERGED_ROW.format(cells="".join(f"<td>{cell}</td>" for cell in cells)))
+        merged.append(_HTML_MERGED_END)
+        return "".join(merged)
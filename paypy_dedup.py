@@ -0,0 +1,120 @@
+"""De-duplication of course sections listed more than once.
+
+District exports often repeat a section, for example a term row repeated
+or a co-taught class listed once per teacher. Counting every row pays the
+overload twice. dedup_sections() numbers the sections through a hashed
+index of the section key (pd.util.hash_pandas_object + pd.factorize). That
+is linear in the number of rows, with no sorting. It then applies one of
+these policies:
+
+- "first": keep the first row of each section.
+- "max": keep the row with the most students.
+- "split": first keep each teacher's row with the most students. Then
+  divide the section's students across its co-teachers, who are rows with
+  the same key apart from Staff Name. The students add up to the largest
+  listed count; the remainder goes to the teachers listed first.
+
+The key is Year, Organization, Course Title and Staff Name. A Section ID
+column is added to it when the roster has one. Without a Section ID,
+"split" treats every teacher of the same course title at an organization
+as co-teachers, so use it with rosters that identify sections.
+"""
+from paypy_lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+DEDUP_POLICIES = {
+    "first": "Keep the first row",
+    "max": "Keep the row with the most students",
+    "split": "Split students across co-teachers",
+}
+
+SECTION_ID = "Section ID"
+DEDUP_KEY = ["Year", "Organization", "Course Title", "Staff Name"]
+
+SUMMARY_COLUMNS = ["Staff Name", "Rows", "Students Listed", "Students Counted"]
+
+
+def _group_codes(frame, columns):
+    """Numbers the distinct combinations of the columns in order of first appearance"""
+    hashes = pd.util.hash_pandas_object(frame[columns], index=False).to_numpy()
+    codes, uniques = pd.factorize(hashes)
+    return codes, len(uniques)
+
+
+def _max_rows(students, codes, num_groups):
+    """Returns a mask keeping the first row with the most students in each group"""
+    keep = np.zeros(len(students), dtype=bool)
+    if num_groups:
+        keep[pd.Series(students).groupby(codes, sort=False).idxmax().to_numpy()] = True
+    return keep
+
+
+def _summary(sections, key, codes, counted):
+    """One row per group listed more than once: its key, staff, rows and students before and after"""
+    sizes = np.bincount(codes)
+    merged = sizes[codes] > 1
+    if not merged.any():
+        return pd.DataFrame(columns=key + [col for col in SUMMARY_COLUMNS if col not in key])
+
+    rows = sections[merged].assign(**{"Students Counted": counted[merged]})
+    groups = rows.groupby(codes[merged], sort=False)
+    summary = groups[key].first()
+
+    # Distinct staff per group in listed order, joined in one pass rather than a Python call per group
+    staff = {}
+    for code, name in zip(codes[merged].tolist(), rows["Staff Name"].astype(str).tolist()):
+        staff.setdefault(code, {})[name] = None
+    summary["Staff Name"] = ["; ".join(staff[code]) for code in summary.index.tolist()]
+    summary["Rows"] = groups.size()
+    summary["Students Listed"] = groups["Total Students"].sum()
+    summary["Students Counted"] = groups["Students Counted"].sum()
+    return summary.reset_index(drop=True)
+
+
+def dedup_sections(sections, policy, key=None):
+    """Applies a de-duplication policy to section rows.
+
+    Returns (sections, summary): the sections without the Section ID column, and one summary row per
+    section that was listed more than once.
+    """
+    if policy not in DEDUP_POLICIES:
+        raise ValueError(f"Unknown de-duplication policy: {policy}. Use {', '.join(DEDUP_POLICIES)}")
+    unknown = [col for col in (key or []) if col not in sections.columns and col != SECTION_ID]
+    if unknown:
+        raise ValueError(f"Unknown de-duplication key column(s): {', '.join(unknown)}")
+    key = [col for col in (key or DEDUP_KEY) if col in sections.columns]
+    if SECTION_ID in sections.columns and SECTION_ID not in key:
+        key.append(SECTION_ID)
+    if "Staff Name" not in key:
+        key.append("Staff Name")
+    if policy == "split" and key == ["Staff Name"]:
+        raise ValueError("Splitting across co-teachers needs key columns besides Staff Name")
+    sections = sections.reset_index(drop=True)
+    students = sections["Total Students"].to_numpy()
+
+    codes, num_groups = _group_codes(sections, key)
+    if policy == "first":
+        keep = ~pd.Series(codes).duplicated().to_numpy()
+    else:
+        keep = _max_rows(students, codes, num_groups)
+    counted = np.where(keep, students, 0)
+
+    if policy == "split":
+        # Co-teachers share the key apart from Staff Name; each gets an equal share, remainder to the first listed
+        section_key = [col for col in key if col != "Staff Name"]
+        codes, _ = _group_codes(sections, section_key)
+        kept_codes = codes[keep]
+        teachers = np.bincount(kept_codes)[kept_codes]
+        section_students = pd.Series(students[keep]).groupby(kept_codes).transform("max").to_numpy()
+        rank = pd.Series(kept_codes).groupby(kept_codes).cumcount().to_numpy()
+        shares = section_students // teachers + (rank < section_students % teachers)
+        counted[keep] = shares
+        summary = _summary(sections, section_key, codes, counted)
+        sections = sections[keep].assign(**{"Total Students": shares.astype(students.dtype)})
+    else:
+        summary = _summary(sections, key, codes, counted)
+        sections = sections[keep]
+
+    return sections.drop(columns=[SECTION_ID], errors="ignore").reset_index(drop=True), summary
@@ -0,0 +1,37 @@
+"""Formatting helpers shared by the exports, the Streamlit app and the batch CLI.
+
+Pay is kept in integer cents everywhere; format_cents() and money_cells()
+turn it into $0.00 text only at the edges. safe_filename() and
+unique_filename() name report files written per school, staff member or
+organization.
+"""
+import os
+import re
+
+
+def format_cents(cents):
+    """Formats an integer number of cents as a $0.00 string"""
+    sign = "-" if cents < 0 else ""
+    dollars, cents = divmod(abs(int(cents)), 100)
+    return f"{sign}${dollars}.{cents:02d}"
+
+
+def money_cells(values):
+    """Formats a column of integer cents as $0.00 strings"""
+    return [format_cents(value) for value in values.tolist()]
+
+
+def safe_filename(name):
+    """Replaces characters that are not safe in file names"""
+    return re.sub(r"[^\w\- .]+", "_", name).strip() or "report"
+
+
+def unique_filename(filename, used_names):
+    """Adds a numeric suffix to filename if it is already in used_names"""
+    stem, ext = os.path.splitext(filename)
+    candidate, counter = filename, 1
+    while candidate.lower() in used_names:
+        counter += 1
+        candidate = f"{stem}_{counter}{ext}"
+    used_names.add(candidate.lower())
+    return candidate
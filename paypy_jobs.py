@@ -0,0 +1,232 @@
+"""Background job queue for roster processing.
+
+Uploads are submitted as jobs to a local worker pool, so a large roster
+never blocks the Streamlit session that submitted it:
+
+    queue = JobQueue("thread")  # or "process"
+    job = queue.submit(roster_bytes, "lincoln_roster.csv", school_name="Lincoln", num_weeks=4, pay_rate=1.25)
+    job.status, job.progress  # -> "running", (0.6, "Writing CSV report")
+    job.result["calculator"], job.result["csv_bytes"], job.result["html_bytes"]
+
+A job processes the roster and builds the CSV and HTML reports, which are
+kept with the job for download. Submitting the same file contents with the
+same settings and rules returns the existing job instead of queueing a new
+one (unless that job failed). The backend is pluggable: anything with
+submit(fn, job_id, *args) -> Future, progress(job_id) and shutdown() works.
+"""
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from paypy_rules import get_rule_set
+
+# Default backend for the app; PAYPY_JOB_BACKEND=process runs jobs in worker processes
+JOB_BACKEND = os.environ.get("PAYPY_JOB_BACKEND", "thread")
+
+# Finished jobs kept (with their results) before the oldest are dropped
+JOB_HISTORY = 32
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def run_job(job_id, progress, roster_bytes, filename, params):
+    """Processes one roster and builds its reports; runs on a backend worker"""
+    # Imported here so queueing a job never loads the engine until a worker runs one
+    from paypy_core import OverloadPayCalculator, content_hash
+    from paypy_metrics import shared_hooks_from_env
+
+    def report(fraction, message):
+        progress[job_id] = (fraction, message)
+
+    report(0.05, "Processing roster")
+    calculator = OverloadPayCalculator(
+        get_rule_set(params.get("district"), params.get("rules_path")),
+        # The same JSON-lines and Prometheus hooks as foreground runs (JSON lines only in worker processes)
+        metrics_hooks=shared_hooks_from_env(),
+        dedup_policy=params.get("dedup_policy"),
+        dedup_key=params.get("dedup_key")
+    )
+    file = io.BytesIO(roster_bytes)
+    file.name = filename
+    success, message = calculator.process_data(
+        file,
+        params.get("school_name", ""),
+        params.get("num_weeks", 4),
+        params.get("pay_rate", 1.25),
+        params.get("show_only_nonzero", False),
+        chunksize=params.get("chunksize")
+    )
+    if not success:
+        report(1.0, message)
+        return {"success": False, "message": message, "calculator": calculator}
+    calculator.file_hash = content_hash(file)
+
+    report(0.6, "Writing CSV report")
+    csv_bytes = calculator.get_csv_report_bytes()
+    report(0.8, "Writing HTML report")
+    html_bytes = calculator.get_html_report_bytes()
+    report(1.0, "Done")
+    return {
+        "success": True,
+        "message": message,
+        "calculator": calculator,
+        "csv_bytes": csv_bytes,
+        "html_bytes": html_bytes,
+    }
+
+
+class ThreadBackend:
+    """Runs jobs on a thread pool in this process"""
+
+    name = "thread"
+
+    def __init__(self, max_workers=None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="paypy-job")
+        self._progress = {}
+
+    def submit(self, fn, job_id, *args):
+        return self._executor.submit(fn, job_id, self._progress, *args)
+
+    def progress(self, job_id):
+        return self._progress.get(job_id)
+
+    def forget(self, job_id):
+        self._progress.pop(job_id, None)
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+
+
+class ProcessBackend(ThreadBackend):
+    """Runs jobs in worker processes; progress is shared through a manager process"""
+
+    name = "process"
+
+    def __init__(self, max_workers=None):
+        self._manager = multiprocessing.Manager()
+        self._executor = ProcessPoolExecutor(max_workers=max_workers)
+        self._progress = self._manager.dict()
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
+        self._manager.shutdown()
+
+
+BACKENDS = {"thread": ThreadBackend, "process": ProcessBackend}
+
+
+def job_key(roster_bytes, params):
+    """Identifies a submission by file contents, settings and the rules they resolve to"""
+    rules = get_rule_set(params.get("district"), params.get("rules_path"))
+    digest = hashlib.sha256(roster_bytes)
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    digest.update(rules.fingerprint.encode())
+    return digest.hexdigest()
+
+
+class Job:
+    """A submitted roster: its status, progress and, once done, its result"""
+
+    def __init__(self, job_id, key, filename, params, backend, future):
+        self.id = job_id
+        self.key = key
+        self.filename = filename
+        self.params = params
+        self.submitted = time.time()
+        self._backend = backend
+        self._future = future
+
+    @property
+    def status(self):
+        if not self._future.done():
+            return RUNNING if self._future.running() else QUEUED
+        if self._future.exception() is not None or not self._future.result()["success"]:
+            return FAILED
+        return DONE
+
+    @property
+    def done(self):
+        return self._future.done()
+
+    @property
+    def progress(self):
+        """Returns (fraction, message) for the job"""
+        if self._future.done():
+            return 1.0, "Done" if self.status == DONE else "Failed"
+        reported = self._backend.progress(self.id)
+        if reported is not None:
+            return tuple(reported)
+        return 0.0, "Waiting for a worker" if self.status == QUEUED else "Starting"
+
+    @property
+    def result(self):
+        """Returns the job's result dict, or None until it is done"""
+        if not self._future.done() or self._future.exception() is not None:
+            return None
+        return self._future.result()
+
+    @property
+    def error(self):
+        """Returns why the job failed, or None"""
+        if not self._future.done():
+            return None
+        exception = self._future.exception()
+        if exception is not None:
+            return f"An error occurred while processing the file: {exception}"
+        result = self._future.result()
+        return None if result["success"] else result["message"]
+
+
+class JobQueue:
+    """Queues roster jobs on a backend worker pool, deduplicating identical submissions"""
+
+    def __init__(self, backend=JOB_BACKEND, max_workers=None, history=JOB_HISTORY):
+        self.backend = BACKENDS[backend](max_workers) if isinstance(backend, str) else backend
+        self.history = history
+        self._jobs = OrderedDict()
+        self._by_key = {}
+        self._lock = threading.Lock()
+
+    def submit(self, roster_bytes, filename, **params):
+        """Queues a roster, or returns the existing job for an identical submission"""
+        key = job_key(roster_bytes, params)
+        with self._lock:
+            job = self._by_key.get(key)
+            if job is not None and job.status != FAILED:
+                return job
+
+            job_id = uuid.uuid4().hex
+            future = self.backend.submit(run_job, job_id, roster_bytes, filename, params)
+            job = Job(job_id, key, filename, params, self.backend, future)
+            self._jobs[job_id] = job
+            self._by_key[key] = job
+            self._prune()
+        return job
+
+    def _prune(self):
+        # Drop the oldest finished jobs beyond the history limit; unfinished jobs are always kept
+        finished = [job for job in self._jobs.values() if job.done]
+        for job in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job.id]
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+            self.backend.forget(job.id)
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        """Returns the known jobs, oldest first"""
+        with self._lock:
+            return list(self._jobs.values())
+
+    def shutdown(self, wait=True):
+        self.backend.shutdown(wait=wait)
@@ -0,0 +1,48 @@
+"""Deferred imports for heavy dependencies.
+
+Importing pandas and numpy takes most of the half second it costs to load
+the calculator. The engine modules bind them through lazy_import() instead:
+
+    pd = lazy_import("pandas")
+
+The real module is imported on first attribute access (pd.read_csv, ...),
+so a batch or cron invocation that exits early (--help, a bad argument, a
+missing file) never pays for it, and code reads the same as with a plain
+import. See benchmarks/bench_import.py.
+"""
+import importlib
+import sys
+import types
+
+
+class LazyModule(types.ModuleType):
+    """Stands in for a module until one of its attributes is first used"""
+
+    def __init__(self, name):
+        super().__init__(name)
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            self._module = importlib.import_module(self.__name__)
+        return self._module
+
+    def __getattr__(self, attribute):
+        if attribute.startswith("__") and attribute.endswith("__"):
+            # Keep introspection (copy, pickle, doc tools) from importing the module
+            if self._module is None:
+                raise AttributeError(attribute)
+        return getattr(self._load(), attribute)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self.__name__!r} ({state})>"
+
+
+def lazy_import(name):
+    """Returns the module if it is already imported, otherwise a LazyModule that imports it on first use"""
+    module = sys.modules.get(name)
+    return module if module is not None else LazyModule(name)
@@ -0,0 +1,361 @@
+"""Per-stage metrics for the overload pay calculator.
+
+After each run, OverloadPayCalculator.metrics holds a PipelineMetrics object.
+For every stage (parse, filter, classify, aggregate and the exports) it
+records the wall time, the rows going in and out, and the peak memory.
+Hooks passed to the calculator receive the metrics after every run:
+
+    calculator = OverloadPayCalculator(metrics_hooks=[JsonLinesExporter("metrics.jsonl")])
+
+hooks_from_env() builds the hooks from the environment:
+- PAYPY_METRICS_JSONL appends one JSON line per run to a file.
+- PAYPY_METRICS_PORT serves the latest metrics as Prometheus text at
+  http://127.0.0.1:<port>/metrics.
+
+The app and its background jobs use shared_hooks_from_env(), which builds
+them once per process.
+
+PAYPY_METRICS_TRACE_MEMORY=1 measures each stage's peak allocation with
+tracemalloc, which slows processing down. Without it, only the process's
+peak RSS is recorded after each stage. Concurrent runs in one process
+share the trace, so a stage that overlaps another stage reports the peak
+of both together.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from paypy_lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+TRACE_MEMORY = os.environ.get("PAYPY_METRICS_TRACE_MEMORY", "") not in ("", "0")
+
+STAGE_FIELDS = ["stage", "seconds", "calls", "rows_in", "rows_out", "peak_bytes", "max_rss_bytes"]
+
+
+def _max_rss_bytes():
+    """Returns the process's peak resident memory so far, or None where it is unavailable"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS reports bytes, Linux kilobytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+# Runs in one process (app sessions, job threads) share tracemalloc: it is started by the first traced run and
+# stopped after the last, and the peak is only reset when no traced stage is running, so overlapping stages
+# never lose each other's peaks
+_trace_lock = threading.Lock()
+_trace_runs = 0
+_trace_stages = 0
+_trace_started = False
+
+
+def _start_trace():
+    global _trace_runs, _trace_started
+    with _trace_lock:
+        if _trace_runs == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _trace_started = True
+        _trace_runs += 1
+
+
+def _stop_trace():
+    global _trace_runs, _trace_started
+    with _trace_lock:
+        _trace_runs -= 1
+        if _trace_runs == 0 and _trace_started:
+            tracemalloc.stop()
+            _trace_started = False
+
+
+def _enter_traced_stage():
+    global _trace_stages
+    with _trace_lock:
+        if _trace_stages == 0:
+            tracemalloc.reset_peak()
+        _trace_stages += 1
+
+
+def _exit_traced_stage():
+    """Returns the peak traced memory since the earliest running traced stage began"""
+    global _trace_stages
+    with _trace_lock:
+        _trace_stages -= 1
+        return tracemalloc.get_traced_memory()[1]
+
+
+class StageMetrics:
+    """Wall time, row counts and memory for one pipeline stage"""
+
+    def __init__(self, name):
+        self.name = name
+        self.seconds = 0.0
+        self.calls = 0
+        self.rows_in = None
+        self.rows_out = None
+        self.peak_bytes = None
+        self.max_rss_bytes = None
+
+    def add_rows(self, rows_in=None, rows_out=None):
+        """Adds to the row counts; streamed rosters call this once per chunk"""
+        if rows_in is not None:
+            self.rows_in = (self.rows_in or 0) + int(rows_in)
+        if rows_out is not None:
+            self.rows_out = (self.rows_out or 0) + int(rows_out)
+
+    def to_dict(self):
+        return {
+            "stage": self.name,
+            "seconds": round(self.seconds, 6),
+            "calls": self.calls,
+            "rows_in": self.rows_in,
+            "rows_out": self.rows_out,
+            "peak_bytes": self.peak_bytes,
+            "max_rss_bytes": self.max_rss_bytes,
+        }
+
+
+class PipelineMetrics:
+    """Metrics for one calculator run: an event (process, csv_export, ...) made of timed stages"""
+
+    def __init__(self, event="process", school_name="", trace_memory=False):
+        self.event = event
+        self.school_name = school_name
+        self.started = datetime.now(timezone.utc)
+        self.stages = {}
+        self.status = "running"
+        self.error = None
+        self.cache = None
+        self.seconds = 0.0
+        self._start = time.perf_counter()
+
+        # Hold a reference on the shared trace until finish()
+        self.trace_memory = trace_memory
+        self._traced = False
+        if trace_memory:
+            _start_trace()
+            self._traced = True
+
+    @contextmanager
+    def stage(self, name):
+        """Times a block as a stage; entering the same stage again adds to it"""
+        stage = self.stages.get(name)
+        if stage is None:
+            stage = self.stages[name] = StageMetrics(name)
+
+        tracing = self._traced
+        if tracing:
+            _enter_traced_stage()
+        start = time.perf_counter()
+        try:
+            yield stage
+        finally:
+            stage.seconds += time.perf_counter() - start
+            stage.calls += 1
+            if tracing:
+                stage.peak_bytes = max(stage.peak_bytes or 0, _exit_traced_stage())
+            stage.max_rss_bytes = _max_rss_bytes()
+
+    def finish(self, status="ok", error=None):
+        """Records the outcome and total wall time, and releases this run's reference on the memory trace"""
+        self.status = status
+        self.error = error
+        self.seconds = time.perf_counter() - self._start
+        if self._traced:
+            _stop_trace()
+            self._traced = False
+
+    def to_dict(self):
+        return {
+            "event": self.event,
+            "school": self.school_name,
+            "started": self.started.isoformat(timespec="milliseconds"),
+            "status": self.status,
+            "error": self.error,
+            "cache": self.cache,
+            "seconds": round(self.seconds, 6),
+            "stages": [stage.to_dict() for stage in self.stages.values()],
+        }
+
+    def to_json_line(self):
+        return json.dumps(self.to_dict())
+
+    def to_frame(self):
+        """Returns one row per stage"""
+        frame = pd.DataFrame([stage.to_dict() for stage in self.stages.values()], columns=STAGE_FIELDS)
+        return frame.astype({field: "Int64" for field in STAGE_FIELDS if field not in ("stage", "seconds")})
+
+
+def emit_metrics(metrics, hooks):
+    """Passes metrics to each hook; a failing hook is logged and never fails the run"""
+    for hook in hooks:
+        try:
+            hook(metrics)
+        except Exception:
+            logger.exception("Metrics hook %r failed", hook)
+
+
+class JsonLinesExporter:
+    """Metrics hook that appends one JSON object per run to a file"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, metrics):
+        line = metrics.to_json_line() + "\n"
+        with self._lock:
+            # One write per line so concurrent batch workers don't interleave
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def __getstate__(self):
+        # Calculators carry their hooks back from job worker processes; the lock is per process
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def __repr__(self):
+        return f"JsonLinesExporter({self.path!r})"
+
+
+def _label(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+class PrometheusEndpoint:
+    """Metrics hook that serves the latest run per school and event in the Prometheus text format"""
+
+    STAGE_GAUGES = [
+        ("seconds", "paypy_stage_seconds", "Wall time of the stage in the latest run"),
+        ("rows_in", "paypy_stage_rows_in", "Rows going into the stage in the latest run"),
+        ("rows_out", "paypy_stage_rows_out", "Rows coming out of the stage in the latest run"),
+        ("peak_bytes", "paypy_stage_peak_bytes", "Peak traced allocation during the stage in the latest run"),
+    ]
+
+    def __init__(self, port, host="127.0.0.1"):
+        self.host = host
+        self.port = port
+        self._latest = {}
+        self._runs = {}
+        self._lock = threading.Lock()
+        self._server = None
+
+    def __call__(self, metrics):
+        with self._lock:
+            self._latest[(metrics.school_name, metrics.event)] = metrics.to_dict()
+            key = (metrics.event, metrics.status)
+            self._runs[key] = self._runs.get(key, 0) + 1
+
+    def render(self):
+        """Returns the metrics in the Prometheus text exposition format"""
+        with self._lock:
+            latest = list(self._latest.values())
+            runs = dict(self._runs)
+
+        lines = [
+            "# HELP paypy_runs_total Calculator runs by event and status",
+            "# TYPE paypy_runs_total counter",
+        ]
+        for (event, status), count in sorted(runs.items()):
+            lines.append(f'paypy_runs_total{{event="{_label(event)}",status="{_label(status)}"}} {count}')
+
+        lines += [
+            "# HELP paypy_run_seconds Wall time of the latest run",
+            "# TYPE paypy_run_seconds gauge",
+        ]
+        for run in latest:
+            lines.append(f'paypy_run_seconds{{school="{_label(run["school"])}",event="{_label(run["event"])}"}} {run["seconds"]}')
+
+        for field, name, description in self.STAGE_GAUGES:
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} gauge"]
+            for run in latest:
+                for stage in run["stages"]:
+                    if stage[field] is not None:
+                        labels = f'school="{_label(run["school"])}",event="{_label(run["event"])}",stage="{_label(stage["stage"])}"'
+                        lines.append(f"{name}{{{labels}}} {stage[field]}")
+        return "\n".join(lines) + "\n"
+
+    def start(self):
+        """Starts serving /metrics from a background thread"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        endpoint = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = endpoint.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug("metrics endpoint: " + format, *args)
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="paypy-metrics", daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __repr__(self):
+        return f"PrometheusEndpoint({self.host}:{self.port})"
+
+
+def hooks_from_env(serve=True):
+    """Builds the metrics hooks enabled by PAYPY_METRICS_JSONL and PAYPY_METRICS_PORT (the endpoint only if serve)"""
+    hooks = []
+    jsonl_path = os.environ.get("PAYPY_METRICS_JSONL")
+    if jsonl_path:
+        hooks.append(JsonLinesExporter(jsonl_path))
+    port = os.environ.get("PAYPY_METRICS_PORT")
+    if port and serve:
+        try:
+            hooks.append(PrometheusEndpoint(int(port)).start())
+        except (OSError, ValueError):
+            logger.exception("Could not start the metrics endpoint on port %s", port)
+    return hooks
+
+
+_shared_hooks = {}
+_shared_hooks_lock = threading.Lock()
+
+
+def shared_hooks_from_env():
+    """Returns hooks_from_env() built once per process, so app sessions and background jobs share one endpoint.
+
+    Job worker processes get the JSON-lines hook only; the endpoint's port belongs to the process serving the app.
+    """
+    import multiprocessing
+
+    with _shared_hooks_lock:
+        pid = os.getpid()
+        if pid not in _shared_hooks:
+            _shared_hooks[pid] = hooks_from_env(serve=multiprocessing.parent_process() is None)
+        return _shared_hooks[pid]
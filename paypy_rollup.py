@@ -0,0 +1,140 @@
+"""Multi-period, multi-school rollups of overload pay.
+
+A Rollup holds partial aggregates at the finest grain: one row per
+period, school, organization, staff member and subject category. Its
+measures (sections, students, overload and pay in cents) are plain sums.
+That has two consequences:
+
+- Rollups merge by adding. Schools or periods can be aggregated in
+  parallel and then combined, and adding a new period merges one small
+  partial instead of re-aggregating the history.
+- Any coarser rollup, such as year-to-date totals per organization,
+  is a group-by over the partial.
+
+    history = Rollup.combine([Rollup.from_calculator(calculator, "2025-01"), ...])
+    history = history + Rollup.from_calculator(new_calculator, "2025-02")
+    history.by("Organization")                   # totals per organization across all periods
+    history.year_to_date("2025-02", "Staff Name")  # per staff member, 2025-01 through 2025-02
+    history.year_to_date("2025-02", since="2024-09")  # school year to date
+
+Periods are labels compared as strings, so use sortable labels such as
+"2025-01". ResultStore keeps one partial per school and period alongside
+the processed rows (see ResultStore.read_rollup).
+"""
+from paypy_lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+DIMENSIONS = ["Period", "School", "Organization", "Staff Name", "Subject"]
+MEASURES = ["Sections", "Total Students", "Total Overload", "Overload Pay Cents"]
+
+
+def _sum_by(frame, dimensions):
+    """Sums the measures per combination of dimensions, in sorted order"""
+    if not dimensions:
+        return frame[MEASURES].sum().to_frame().T.astype("int64")
+    return (
+        frame.groupby(dimensions, sort=True, observed=True, dropna=False)[MEASURES].sum()
+        .astype("int64")
+        .reset_index()
+    )
+
+
+class Rollup:
+    """Mergeable partial aggregates of processed overload pay rows"""
+
+    def __init__(self, partials=None):
+        if partials is None:
+            partials = pd.DataFrame({column: pd.Series(dtype=object) for column in DIMENSIONS}).assign(
+                **{measure: pd.Series(dtype="int64") for measure in MEASURES}
+            )
+        self.partials = partials
+
+    @classmethod
+    def from_calculator(cls, calculator, period, school=None):
+        """Aggregates one processed roster (an OverloadPayCalculator after process_data) for a period"""
+        rows = calculator.processed_df
+        organization = rows["Organization"].astype(object)
+        subject = calculator.rules.subjects_for(rows["Course Title"])
+        frame = pd.DataFrame({
+            "Period": str(period),
+            "School": school if school is not None else (calculator.school_name or ""),
+            "Organization": organization.where(organization.notna(), "").astype(str).to_numpy(),
+            "Staff Name": rows["Staff Name"].astype(object).to_numpy(),
+            "Subject": pd.Series(subject, dtype=object).fillna("").to_numpy(),
+            "Sections": 1,
+            "Total Students": rows["Total Students"].to_numpy(),
+            "Total Overload": rows["Total Overload"].to_numpy(),
+            "Overload Pay Cents": rows["Overload Pay Cents"].to_numpy(),
+        })
+        return cls(_sum_by(frame, DIMENSIONS))
+
+    @classmethod
+    def from_partials(cls, frame):
+        """Wraps stored partial aggregates, re-summing in case they overlap"""
+        return cls(_sum_by(frame[DIMENSIONS + MEASURES], DIMENSIONS))
+
+    @classmethod
+    def combine(cls, rollups):
+        """Merges any number of rollups in one pass"""
+        frames = [rollup.partials for rollup in rollups if not rollup.partials.empty]
+        if not frames:
+            return cls()
+        return cls(_sum_by(pd.concat(frames, ignore_index=True), DIMENSIONS))
+
+    def merge(self, *others):
+        return Rollup.combine([self, *others])
+
+    def __add__(self, other):
+        return self.merge(other)
+
+    def __len__(self):
+        return len(self.partials)
+
+    def periods(self):
+        return sorted(self.partials["Period"].unique())
+
+    def schools(self):
+        return sorted(self.partials["School"].unique())
+
+    def select(self, periods=None, schools=None, through=None, since=None):
+        """Returns a rollup limited to some periods or schools, or to periods from `since` through `through`"""
+        partials = self.partials
+        if periods is not None:
+            partials = partials[partials["Period"].isin([str(period) for period in periods])]
+        if schools is not None:
+            partials = partials[partials["School"].isin(schools)]
+        if since is not None:
+            partials = partials[partials["Period"] >= str(since)]
+        if through is not None:
+            partials = partials[partials["Period"] <= str(through)]
+        return Rollup(partials.reset_index(drop=True))
+
+    def by(self, *dimensions):
+        """Returns totals per combination of the given dimensions, e.g. by("School", "Period")"""
+        unknown = [dimension for dimension in dimensions if dimension not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown rollup dimension(s): {', '.join(unknown)}. Use {', '.join(DIMENSIONS)}")
+        return _sum_by(self.partials, list(dimensions))
+
+    def year_to_date(self, through, *dimensions, since=None):
+        """Returns totals per dimension over the periods from the start of the year through `through`.
+
+        The year starts at `since` if given (e.g. "2024-09" for a school year), otherwise at the calendar
+        year that `through` begins with.
+        """
+        if since is None:
+            year = str(through)[:4]
+            if not year.isdigit():
+                raise ValueError(f"Cannot tell the year of period '{through}'; pass since= the first period of the year")
+            since = year
+        return self.select(through=through, since=since).by(*dimensions)
+
+    def grand_total(self):
+        """Returns the overall totals, in the shape of OverloadPayCalculator.grand_total"""
+        totals = self.by().iloc[0]
+        return {
+            "total_overload": int(totals["Total Overload"]),
+            "overload_pay_cents": int(totals["Overload Pay Cents"]),
+            "overload_pay": int(totals["Overload Pay Cents"]) / 100,
+        }
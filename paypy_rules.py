@@ -0,0 +1,204 @@
+"""District course-classification rules for the overload pay calculator.
+
+A rule set defines which course titles qualify for overload pay (subject
+patterns) and the ordered base-student threshold rules used to classify
+them. Rule sets are loaded per district from a JSON config file:
+
+    {
+        "default_district": "default",
+        "districts": {
+            "default": {
+                "subjects": ["MUSIC", "PHYS ED", "ART", "CREATIVE"],
+                "thresholds": [
+                    {"label": "MIXED/1/2/3", "patterns": ["MIXED", " 1", " 2", " 3"], "base_students": 23},
+                    ...
+                ],
+                "default_base_students": 23
+            }
+        }
+    }
+
+Subject patterns are matched case-insensitively anywhere in the course
+title. Threshold patterns are matched against the upper-cased title and the
+first rule (in file order) with any matching pattern wins.
+"""
+import hashlib
+import json
+import os
+import re
+
+from paypy_lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Config file shipped next to this module; PAYPY_RULES overrides it
+DEFAULT_RULES_PATH = os.environ.get(
+    "PAYPY_RULES",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "course_rules.json")
+)
+
+# Rules used when no config file is available
+DEFAULT_DISTRICT_RULES = {
+    "subjects": ["MUSIC", "PHYS ED", "ART", "CREATIVE"],
+    "thresholds": [
+        {"label": "MIXED/1/2/3", "patterns": ["MIXED", " 1", " 2", " 3"], "base_students": 23},
+        {"label": "4/5", "patterns": [" 4", " 5"], "base_students": 26},
+        {"label": "KINDER/K", "patterns": ["KINDER", " K"], "base_students": 22},
+    ],
+    "default_base_students": 23,
+}
+
+
+class CourseRuleSet:
+    """Compiled subject and base-student threshold rules for one district"""
+
+    def __init__(self, name, subjects, thresholds, default_base_students):
+        if not subjects:
+            raise ValueError(f"Rule set '{name}' must define at least one subject pattern")
+
+        self.name = name
+        self.subjects = [str(subject) for subject in subjects]
+        self.thresholds = [
+            {
+                "label": str(rule.get("label") or "/".join(p.strip() for p in rule["patterns"])),
+                "patterns": [str(pattern).upper() for pattern in rule["patterns"]],
+                "base_students": int(rule["base_students"]),
+            }
+            for rule in thresholds
+        ]
+        self.default_base_students = int(default_base_students)
+
+        # One case-insensitive matcher for all subjects
+        self._subject_regex = re.compile("|".join(re.escape(subject) for subject in self.subjects), re.IGNORECASE)
+
+        # One matcher for all threshold rules: a zero-width lookahead tried at every position, with one
+        # named group per rule in priority order, so the lowest matched group index is the winning rule
+        alternatives = [
+            f"(?P<rule{index}>{'|'.join(re.escape(pattern) for pattern in rule['patterns'])})"
+            for index, rule in enumerate(self.thresholds)
+            if rule["patterns"]
+        ]
+        self._threshold_regex = re.compile(f"(?=(?:{'|'.join(alternatives)}))") if alternatives else None
+
+    @classmethod
+    def from_dict(cls, name, config):
+        return cls(
+            name,
+            config["subjects"],
+            config["thresholds"],
+            config.get("default_base_students", DEFAULT_DISTRICT_RULES["default_base_students"]),
+        )
+
+    def to_dict(self):
+        return {
+            "subjects": list(self.subjects),
+            "thresholds": [dict(rule) for rule in self.thresholds],
+            "default_base_students": self.default_base_students,
+        }
+
+    @property
+    def fingerprint(self):
+        """Stable hash of the rules, used in cache keys"""
+        return hashlib.sha256(json.dumps(self.to_dict(), sort_keys=True).encode()).hexdigest()[:16]
+
+    def qualifies(self, title):
+        """Returns True if a course title matches one of the subject patterns"""
+        return isinstance(title, str) and self._subject_regex.search(title) is not None
+
+    def subject_of(self, title):
+        """Returns the first subject (in config order) a course title matches, or None"""
+        if not isinstance(title, str):
+            return None
+        upper_title = title.upper()
+        return next((subject for subject in self.subjects if subject.upper() in upper_title), None)
+
+    def threshold_index(self, title):
+        """Returns the index of the threshold rule a course title matches, or len(thresholds) for the default"""
+        if self._threshold_regex is None:
+            return len(self.thresholds)
+        matched = [
+            int(group[4:])
+            for match in self._threshold_regex.finditer(str(title).upper())
+            for group, value in match.groupdict().items()
+            if value is not None
+        ]
+        return min(matched) if matched else len(self.thresholds)
+
+    def base_students(self, title):
+        """Returns the base-student threshold for a course title"""
+        return self.tier_base_students()[self.threshold_index(title)]
+
+    def tier_base_students(self):
+        """Base students per threshold rule, followed by the default, in threshold_index() order"""
+        return [rule["base_students"] for rule in self.thresholds] + [self.default_base_students]
+
+    def subject_mask(self, titles):
+        """Vectorized qualifies(): evaluates each distinct title once"""
+        codes, unique_titles = pd.factorize(titles)
+        flags = np.array([self.qualifies(title) for title in unique_titles] + [False], dtype=bool)
+        return flags[codes]
+
+    def subjects_for(self, titles):
+        """Vectorized subject_of(): evaluates each distinct title once"""
+        codes, unique_titles = pd.factorize(titles)
+        subjects = np.array([self.subject_of(title) for title in unique_titles] + [None], dtype=object)
+        return subjects[codes]
+
+    def threshold_indices_for(self, titles):
+        """Vectorized threshold_index(): evaluates each distinct title once"""
+        codes, unique_titles = pd.factorize(titles)
+        indices = np.array(
+            [self.threshold_index(title) for title in unique_titles] + [len(self.thresholds)],
+            dtype=np.intp
+        )
+        return indices[codes]
+
+    def base_students_for(self, titles):
+        """Vectorized base_students(): evaluates each distinct title once"""
+        return np.array(self.tier_base_students(), dtype=np.int64)[self.threshold_indices_for(titles)]
+
+    def subject_text(self, conjunction="or"):
+        """Subjects as prose, e.g. 'MUSIC, PHYS ED, ART, or CREATIVE'"""
+        if len(self.subjects) == 1:
+            return self.subjects[0]
+        if len(self.subjects) == 2:
+            return f"{self.subjects[0]} {conjunction} {self.subjects[1]}"
+        return f"{', '.join(self.subjects[:-1])}, {conjunction} {self.subjects[-1]}"
+
+    def threshold_text(self):
+        """Thresholds as prose, e.g. 'MIXED/1/2/3 = 23 students, 4/5 = 26 students, ...'"""
+        return ", ".join(f"{rule['label']} = {rule['base_students']} students" for rule in self.thresholds)
+
+    def threshold_items(self):
+        """Thresholds as (label, base students) pairs"""
+        return [(rule["label"], rule["base_students"]) for rule in self.thresholds]
+
+
+def load_rule_sets(path=None):
+    """Loads all district rule sets from a JSON config file, returning (rule_sets, default_district)"""
+    path = path or DEFAULT_RULES_PATH
+    if not os.path.exists(path):
+        return {"default": CourseRuleSet.from_dict("default", DEFAULT_DISTRICT_RULES)}, "default"
+
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+
+    districts = config.get("districts") or {}
+    if not districts:
+        raise ValueError(f"No districts defined in {path}")
+
+    rule_sets = {name: CourseRuleSet.from_dict(name, rules) for name, rules in districts.items()}
+    default_district = config.get("default_district") or next(iter(rule_sets))
+    if default_district not in rule_sets:
+        raise ValueError(f"Default district '{default_district}' is not defined in {path}")
+    return rule_sets, default_district
+
+
+def get_rule_set(district=None, path=None):
+    """Returns the rule set for a district, or the config's default district"""
+    rule_sets, default_district = load_rule_sets(path)
+    district = district or default_district
+    if district not in rule_sets:
+        raise ValueError(f"Unknown district '{district}'. Available: {', '.join(sorted(rule_sets))}")
+    return rule_sets[district]
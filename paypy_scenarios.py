@@ -0,0 +1,164 @@
+"""What-if pricing of a processed roster over a grid of pay settings.
+
+Contract negotiations compare many combinations of pay rate, number of
+weeks and base-student thresholds. A ScenarioGrid prices all of them from
+one processed roster, without reading or classifying it again:
+
+    grid = ScenarioGrid.with_offsets(calculator.rules, [1.25, 1.50], [4, 5], [-1, 0, 1])
+    result = grid.evaluate(calculator)   # after process_data
+    result.scenarios                     # totals per scenario
+    result.staff_pay                     # pay per staff member, one column per scenario
+
+The roster's rows are collapsed to distinct (staff, threshold rule,
+students) groups. The overload of every group under every threshold set
+is one broadcast subtraction. Each distinct overload count is priced once
+per pay rate and number of weeks, rounded to the cent like process_data.
+Staff pay is then a matrix product of overload-count histograms with that
+price table, so it matches process_data to the cent for every scenario.
+"""
+from itertools import product
+
+from paypy_core import pay_table_cents
+from paypy_lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+# Threshold override key for courses that match no threshold rule
+DEFAULT_TIER = "Default"
+
+SCENARIO_COLUMNS = [
+    "Scenario", "Thresholds", "Pay Rate", "Weeks", "Total Overload", "Staff With Overload", "Overload Pay Cents",
+    "Change Cents",
+]
+
+
+def scenario_name(thresholds, pay_rate, num_weeks):
+    """Column label for a scenario, e.g. 'Thresholds +1 | $1.50 x 4 wk'"""
+    return f"{thresholds} | ${pay_rate:.2f} x {num_weeks} wk"
+
+
+class ScenarioResult:
+    """Totals of every scenario in a grid, with per-staff pay and overload side by side"""
+
+    def __init__(self, scenarios, staff_pay, staff_overload):
+        # One row per scenario: its settings and totals, and the pay change against the processed run
+        self.scenarios = scenarios
+        # Staff Name, then one column of pay in cents per scenario
+        self.staff_pay = staff_pay
+        # Staff Name, then one column of overload students per threshold set
+        self.staff_overload = staff_overload
+
+
+class ScenarioGrid:
+    """Pay rates, numbers of weeks and threshold sets whose every combination is priced"""
+
+    def __init__(self, pay_rates, num_weeks, thresholds=None):
+        # thresholds maps a name to base-student overrides by threshold label (or DEFAULT_TIER);
+        # an empty override keeps the rule set's thresholds
+        self.pay_rates = [float(rate) for rate in pay_rates]
+        self.num_weeks = [int(weeks) for weeks in num_weeks]
+        self.thresholds = dict(thresholds) if thresholds else {"Current thresholds": {}}
+        if not self.pay_rates or not self.num_weeks:
+            raise ValueError("A scenario grid needs at least one pay rate and one number of weeks")
+        if any(rate < 0 for rate in self.pay_rates) or any(weeks < 0 for weeks in self.num_weeks):
+            raise ValueError("Pay rates and numbers of weeks must not be negative")
+
+    @classmethod
+    def with_offsets(cls, rules, pay_rates, num_weeks, offsets=(0,)):
+        """Builds a grid whose threshold sets move every base-student threshold by the same offset"""
+        labels = [label for label, _ in rules.threshold_items()] + [DEFAULT_TIER]
+        thresholds = {}
+        for offset in dict.fromkeys(int(offset) for offset in offsets):
+            name = "Current thresholds" if offset == 0 else f"Thresholds {offset:+d}"
+            thresholds[name] = {
+                label: base_students + offset for label, base_students in zip(labels, rules.tier_base_students())
+            }
+        return cls(pay_rates, num_weeks, thresholds)
+
+    def __len__(self):
+        return len(self.thresholds) * len(self.pay_rates) * len(self.num_weeks)
+
+    def tier_base_students(self, rules):
+        """Returns base students per threshold set (rows) and threshold rule, default last (columns)"""
+        labels = [label for label, _ in rules.threshold_items()] + [DEFAULT_TIER]
+        current = rules.tier_base_students()
+        bases = []
+        for name, overrides in self.thresholds.items():
+            unknown = [label for label in overrides if label not in labels]
+            if unknown:
+                raise ValueError(
+                    f"Unknown threshold(s) in '{name}': {', '.join(unknown)}. Use {', '.join(labels)}"
+                )
+            bases.append([int(overrides.get(label, base)) for label, base in zip(labels, current)])
+        bases = np.array(bases, dtype=np.int64).reshape(len(self.thresholds), len(labels))
+        if (bases < 0).any():
+            raise ValueError("Base-student thresholds must not be negative")
+        return bases
+
+    def evaluate(self, calculator):
+        """Prices every scenario for a calculator that has processed a roster"""
+        rows = calculator.processed_df
+        with calculator.export_stage("scenarios") as stage:
+            result = self._evaluate(rows, calculator.rules, calculator.grand_total["overload_pay_cents"])
+            stage.add_rows(len(rows), len(result.scenarios))
+        return result
+
+    def _evaluate(self, rows, rules, current_pay_cents):
+        bases = self.tier_base_students(rules)
+        num_tiers = bases.shape[1]
+
+        # Classify once: each row's staff member and threshold rule
+        staff_codes, staff_names = pd.factorize(rows["Staff Name"].astype(object), sort=True)
+        tiers = rules.threshold_indices_for(rows["Course Title"])
+        students = rows["Total Students"].to_numpy(dtype=np.int64)
+
+        # Collapse to distinct (staff, rule, students) groups with their row counts
+        max_students = int(students.max(initial=0)) + 1
+        keys = (staff_codes.astype(np.int64) * num_tiers + tiers) * max_students + students
+        group_codes, group_keys = pd.factorize(keys)
+        group_rows = np.bincount(group_codes, minlength=len(group_keys))
+        group_staff_tiers, group_students = np.divmod(group_keys, max_students)
+        group_staff, group_tiers = np.divmod(group_staff_tiers, num_tiers)
+
+        # Overload of every group under every threshold set: (threshold sets, groups)
+        overload = np.maximum(group_students[None, :] - bases[:, group_tiers], 0)
+        num_sets, num_staff = len(bases), len(staff_names)
+        set_staff = np.arange(num_sets)[:, None] * num_staff + group_staff[None, :]
+        staff_overload = np.bincount(
+            set_staff.ravel(), weights=(overload * group_rows).ravel(), minlength=num_sets * num_staff
+        ).astype(np.int64).reshape(num_sets, num_staff)
+
+        # Rows per staff member and distinct overload count, priced with one matrix product:
+        # (threshold sets, staff, overload counts) @ (overload counts, pay settings)
+        overload_values, overload_codes = np.unique(overload, return_inverse=True)
+        histogram = np.bincount(
+            (set_staff * len(overload_values) + overload_codes.reshape(overload.shape)).ravel(),
+            weights=np.broadcast_to(group_rows, overload.shape).ravel(),
+            minlength=num_sets * num_staff * len(overload_values)
+        ).astype(np.int64).reshape(num_sets, num_staff, len(overload_values))
+        pay_settings = list(product(self.pay_rates, self.num_weeks))
+        price_table = np.column_stack([
+            pay_table_cents(overload_values, pay_rate, num_weeks) for pay_rate, num_weeks in pay_settings
+        ])
+        staff_pay = histogram @ price_table
+
+        names = list(self.thresholds)
+        scenarios = pd.DataFrame(
+            [
+                [scenario_name(name, pay_rate, num_weeks), name, pay_rate, num_weeks]
+                for name in names for pay_rate, num_weeks in pay_settings
+            ],
+            columns=SCENARIO_COLUMNS[:4]
+        )
+        scenarios["Total Overload"] = np.repeat(staff_overload.sum(axis=1), len(pay_settings))
+        scenarios["Staff With Overload"] = np.repeat((staff_overload > 0).sum(axis=1), len(pay_settings))
+        scenarios["Overload Pay Cents"] = staff_pay.sum(axis=1).ravel()
+        scenarios["Change Cents"] = scenarios["Overload Pay Cents"] - int(current_pay_cents)
+
+        staff = pd.Index(staff_names, name="Staff Name")
+        staff_pay = pd.DataFrame(
+            staff_pay.transpose(1, 0, 2).reshape(num_staff, -1), index=staff, columns=scenarios["Scenario"].tolist()
+        )
+        staff_overload = pd.DataFrame(staff_overload.T, index=staff, columns=names)
+        return ScenarioResult(scenarios, staff_pay.reset_index(), staff_overload.reset_index())
@@ -0,0 +1,143 @@
+"""Partitioned Parquet storage for processed rows and staff totals.
+
+Results are written under a root directory as hive-style partitions by
+school and pay period:
+
+    <root>/processed/school=Lincoln%20Elementary/period=2025-01/part-0.parquet
+    <root>/staff_totals/school=Lincoln%20Elementary/period=2025-01/part-0.parquet
+    <root>/rollup/school=Lincoln%20Elementary/period=2025-01/part-0.parquet
+
+Reads only touch the requested columns and the partitions matching the
+school/period selection, and further row filters are pushed down to the
+Parquet reader. The rollup table holds each partition's partial aggregates
+(see paypy_rollup), so multi-period rollups read only those small tables.
+Every partition is written with the same column types (integers as int64,
+text and Year as strings), so partitions from rosters of any size or
+shape read back together. Requires pyarrow.
+"""
+import os
+import shutil
+from urllib.parse import quote
+
+from paypy_lazy import lazy_import
+from paypy_rollup import Rollup
+
+pd = lazy_import("pandas")
+
+PROCESSED_TABLE = "processed"
+STAFF_TOTALS_TABLE = "staff_totals"
+ROLLUP_TABLE = "rollup"
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.dataset
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("The result store requires pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+def _stored_table(pa, frame):
+    """Converts a frame to a table with fixed column types: int64, float64 or string"""
+    columns = {}
+    fields = []
+    for col in frame.columns:
+        values = frame[col]
+        if pd.api.types.is_integer_dtype(values.dtype) and not isinstance(values.dtype, pd.CategoricalDtype):
+            columns[col], field_type = values.astype("int64"), pa.int64()
+        elif pd.api.types.is_float_dtype(values.dtype):
+            columns[col], field_type = values.astype("float64"), pa.float64()
+        else:
+            # Categoricals, objects and a numeric or blank Year all become plain strings
+            columns[col], field_type = values.astype(object).astype("string"), pa.string()
+        fields.append((col, field_type))
+    return pa.Table.from_pandas(pd.DataFrame(columns), schema=pa.schema(fields), preserve_index=False)
+
+
+class ResultStore:
+    """Columnar store of OverloadPayCalculator results partitioned by school and period"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def _partition_dir(self, table, school, period):
+        return os.path.join(
+            self.root, table, f"school={quote(str(school), safe='')}", f"period={quote(str(period), safe='')}"
+        )
+
+    def write(self, calculator, school, period):
+        """Writes a processed calculator's rows, staff totals and rollup partials, replacing that school and period"""
+        pa = _import_pyarrow()
+        # School and period are stored as the partition, not as columns
+        rollup = Rollup.from_calculator(calculator, period, school).partials.drop(columns=["Period", "School"])
+        tables = [
+            (PROCESSED_TABLE, calculator.processed_df),
+            (STAFF_TOTALS_TABLE, calculator.staff_totals),
+            (ROLLUP_TABLE, rollup),
+        ]
+        for table, frame in tables:
+            partition_dir = self._partition_dir(table, school, period)
+            if os.path.isdir(partition_dir):
+                shutil.rmtree(partition_dir)
+            os.makedirs(partition_dir)
+            pa.parquet.write_table(
+                _stored_table(pa, frame),
+                os.path.join(partition_dir, "part-0.parquet")
+            )
+
+    def _dataset(self, table):
+        pa = _import_pyarrow()
+        path = os.path.join(self.root, table)
+        if not os.path.isdir(path):
+            return None
+        partitioning = pa.dataset.partitioning(
+            pa.schema([("school", pa.string()), ("period", pa.string())]), flavor="hive"
+        )
+        return pa.dataset.dataset(path, format="parquet", partitioning=partitioning)
+
+    def _read(self, table, columns=None, schools=None, periods=None, filter=None):
+        pa = _import_pyarrow()
+        dataset = self._dataset(table)
+        if dataset is None:
+            return pd.DataFrame(columns=columns)
+
+        expression = filter
+        for field, values in [("school", schools), ("period", periods)]:
+            if values is not None:
+                condition = pa.dataset.field(field).isin([str(value) for value in values])
+                expression = condition if expression is None else expression & condition
+        return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+    def read_rows(self, columns=None, schools=None, periods=None, filter=None):
+        """Reads processed rows; columns, schools, periods and a pyarrow filter expression narrow the scan"""
+        return self._read(PROCESSED_TABLE, columns, schools, periods, filter)
+
+    def read_staff_totals(self, columns=None, schools=None, periods=None, filter=None):
+        """Reads per-staff totals; columns, schools, periods and a pyarrow filter expression narrow the scan"""
+        return self._read(STAFF_TOTALS_TABLE, columns, schools, periods, filter)
+
+    def read_rollup(self, schools=None, periods=None):
+        """Reads the stored partial aggregates for the selected schools and periods as one Rollup"""
+        partials = self._read(ROLLUP_TABLE, schools=schools, periods=periods)
+        if partials.empty:
+            return Rollup()
+        partials = partials.rename(columns={"school": "School", "period": "Period"})
+        return Rollup.from_partials(partials.astype({"School": object, "Period": object}))
+
+    def partitions(self):
+        """Returns the stored (school, period) pairs"""
+        dataset = self._dataset(STAFF_TOTALS_TABLE)
+        if dataset is None:
+            return pd.DataFrame(columns=["school", "period"])
+        return (
+            dataset.to_table(columns=["school", "period"]).to_pandas()
+            .drop_duplicates()
+            .sort_values(["school", "period"], ignore_index=True)
+        )
+
+
+def field(name):
+    """Returns a pyarrow filter expression for a column, e.g. field("Total Overload") > 0"""
+    return _import_pyarrow().dataset.field(name)
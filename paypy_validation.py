@@ -0,0 +1,206 @@
+"""Schema validation and type coercion for roster files.
+
+RosterValidator checks a roster (or each chunk of a streamed roster) in
+one vectorized pass:
+
+- Common header aliases are renamed to the canonical columns, e.g.
+  "Teacher" -> Staff Name and "Enrollment" -> Total Students.
+- Text columns are stripped, and Total Students is coerced to whole
+  numbers in bulk. Values like "25 " are accepted.
+- Every row-level problem is collected with its row number:
+  - counts that are missing, not numbers, negative, fractional or above
+    MAX_TOTAL_STUDENTS;
+  - missing staff names or course titles;
+  - exact duplicate sections, among the rows selected by duplicate_mask
+    (by default all rows).
+
+Rows with errors are quarantined: they are dropped from the roster and
+kept, with their original values, for review. The rest of the file is
+processed as usual. Duplicate sections are reported as warnings and
+kept. Row 1 is the first row after the header.
+
+Duplicates are found through one hash table of the rows checked so far,
+added to chunk by chunk, so a streamed roster is checked in linear time.
+"""
+import re
+
+from paypy_lazy import lazy_import
+
+np = lazy_import("numpy")
+pd = lazy_import("pandas")
+
+CANONICAL_COLUMNS = ["Year", "Organization", "Course Title", "Staff Name", "Total Students", "Section ID"]
+
+# Accepted spellings per canonical column, compared after normalize_header()
+HEADER_ALIASES = {
+    "Year": ["year", "school year", "academic year", "yr"],
+    "Organization": ["organization", "organisation", "org", "school", "school name", "organization name"],
+    "Course Title": ["course title", "course", "course name", "title", "class", "class name", "section title"],
+    "Staff Name": [
+        "staff name", "staff", "teacher", "teacher name", "instructor", "instructor name", "staff member",
+    ],
+    "Total Students": [
+        "total students", "students", "student count", "num students", "number of students", "# students",
+        "no of students", "enrollment", "total enrollment", "class size",
+    ],
+    "Section ID": ["section id", "section", "section number", "section no", "section code", "sect id", "class id"],
+}
+
+ERROR_COLUMNS = ["Row", "Column", "Value", "Problem", "Severity"]
+
+# Largest believable class size; bigger counts are data errors (and 1e30 would overflow the integer counts)
+MAX_TOTAL_STUDENTS = 10_000
+
+_ALIAS_LOOKUP = {alias: column for column, aliases in HEADER_ALIASES.items() for alias in aliases}
+
+
+def normalize_header(name):
+    """Lower-cases a header and collapses punctuation and spacing, e.g. 'Total_Students ' -> 'total students'"""
+    return re.sub(r"[^a-z0-9#]+", " ", str(name).lower()).strip()
+
+
+def canonical_column(name):
+    """Returns the canonical column a header stands for, or None"""
+    return _ALIAS_LOOKUP.get(normalize_header(name))
+
+
+def header_mapping(columns):
+    """Maps roster headers to canonical column names; exact names win, then the first alias found"""
+    mapping = {}
+    taken = {column for column in columns if column in HEADER_ALIASES}
+    for column in columns:
+        if column in HEADER_ALIASES:
+            continue
+        canonical = canonical_column(column)
+        if canonical is not None and canonical not in taken:
+            mapping[column] = canonical
+            taken.add(canonical)
+    return mapping
+
+
+def _strip_text(values):
+    """Strips surrounding whitespace from text values, turning blanks into missing values"""
+    if not (values.dtype == object or pd.api.types.is_string_dtype(values.dtype)):
+        return values
+    stripped = values.str.strip()
+    return stripped.mask(stripped == "")
+
+
+def _scatter(mask, values):
+    """Expands values for the rows selected by mask to all rows, False elsewhere"""
+    result = np.zeros(len(mask), dtype=bool)
+    result[mask] = values
+    return result
+
+
+class RosterValidator:
+    """Validates and coerces a roster chunk by chunk, keeping row numbers and duplicate checks across chunks"""
+
+    def __init__(self, required_columns=("Course Title", "Staff Name", "Total Students"), duplicate_mask=None):
+        self.required_columns = list(required_columns)
+        # Selects the rows of a coerced chunk to check for duplicates, e.g. only the courses that are priced
+        self.duplicate_mask = duplicate_mask
+        self.rows_seen = 0
+        self._seen_hashes = None
+        self._errors = []
+        self._quarantined = []
+
+    def missing_columns(self, columns):
+        """Returns the required columns a roster lacks, after header aliases are applied"""
+        present = set(columns) | set(header_mapping(columns).values())
+        return [column for column in self.required_columns if column not in present]
+
+    def validate(self, chunk):
+        """Returns the chunk with canonical headers, coerced types and rows with errors removed"""
+        chunk = chunk.rename(columns=header_mapping(chunk.columns)).reset_index(drop=True)
+        original = chunk
+        rows = self.rows_seen + np.arange(1, len(chunk) + 1)
+        self.rows_seen += len(chunk)
+        problems = []
+
+        def problem(mask, column, message, severity="error"):
+            if mask.any():
+                problems.append(pd.DataFrame({
+                    "Row": rows[mask],
+                    "Column": column,
+                    "Value": original[column].to_numpy()[mask] if column in original.columns else "",
+                    "Problem": message,
+                    "Severity": severity,
+                }))
+
+        columns = {}
+        for column in chunk.columns:
+            values = chunk[column]
+            if column in ("Organization", "Course Title", "Staff Name", "Section ID"):
+                values = _strip_text(values)
+            columns[column] = values
+        chunk = pd.DataFrame(columns)
+
+        for column in ("Staff Name", "Course Title"):
+            if column in chunk.columns:
+                problem(chunk[column].isna().to_numpy(), column, f"Missing {column}")
+
+        if "Total Students" in chunk.columns:
+            students = chunk["Total Students"]
+            if not pd.api.types.is_numeric_dtype(students.dtype) or pd.api.types.is_bool_dtype(students.dtype):
+                text = _strip_text(students.astype("string"))
+                students = pd.to_numeric(text, errors="coerce")
+                problem((text.notna() & students.isna()).to_numpy(), "Total Students", "Total Students is not a number")
+                problem(text.isna().to_numpy(), "Total Students", "Missing Total Students")
+            else:
+                problem(students.isna().to_numpy(), "Total Students", "Missing Total Students")
+            values = students.to_numpy(dtype=float, na_value=np.nan)
+            problem(values < 0, "Total Students", "Total Students is negative")
+            problem(
+                (values >= 0) & (values <= MAX_TOTAL_STUDENTS) & (values % 1 != 0),
+                "Total Students", "Total Students is not a whole number"
+            )
+            problem(
+                values > MAX_TOTAL_STUDENTS,
+                "Total Students", f"Total Students is out of range (over {MAX_TOTAL_STUDENTS:,})"
+            )
+            chunk["Total Students"] = values
+
+        # Exact duplicates of an earlier row, in this chunk or a previous one
+        key_columns = [column for column in CANONICAL_COLUMNS if column in chunk.columns]
+        if key_columns and len(chunk):
+            checked = np.ones(len(chunk), dtype=bool)
+            if self.duplicate_mask is not None:
+                checked = np.asarray(self.duplicate_mask(chunk), dtype=bool)
+            hashes = pd.util.hash_pandas_object(chunk[checked][key_columns], index=False).to_numpy()
+            if self._seen_hashes is None:
+                # pandas' own uint64 hash table: lookups and inserts cost only this chunk's rows
+                from pandas._libs.hashtable import UInt64HashTable
+                self._seen_hashes = UInt64HashTable()
+            duplicate = pd.Series(hashes).duplicated().to_numpy() | (self._seen_hashes.lookup(hashes) >= 0)
+            problem(_scatter(checked, duplicate), "", "Duplicate of an earlier section", severity="warning")
+            self._seen_hashes.map_locations(hashes[~duplicate])
+
+        if problems:
+            chunk_problems = pd.concat(problems, ignore_index=True)
+            self._errors.append(chunk_problems)
+            errors = chunk_problems[chunk_problems["Severity"] == "error"]
+            if not errors.empty:
+                bad = np.isin(rows, errors["Row"].to_numpy())
+                reasons = errors.groupby("Row", sort=True)["Problem"].agg("; ".join)
+                quarantined = original[bad].copy()
+                quarantined.insert(0, "Row", rows[bad])
+                quarantined["Problems"] = reasons.reindex(rows[bad]).to_numpy()
+                self._quarantined.append(quarantined)
+                chunk = chunk[~bad].reset_index(drop=True)
+
+        if "Total Students" in chunk.columns:
+            chunk["Total Students"] = chunk["Total Students"].astype(np.int64)
+        return chunk
+
+    def errors(self):
+        """Returns every problem found so far, in row order"""
+        if not self._errors:
+            return pd.DataFrame(columns=ERROR_COLUMNS)
+        return pd.concat(self._errors, ignore_index=True).sort_values("Row", kind="stable", ignore_index=True)
+
+    def quarantined(self):
+        """Returns the rows removed for errors, with their original values, row numbers and problems"""
+        if not self._quarantined:
+            return pd.DataFrame(columns=["Row", "Problems"])
+        return pd.concat(self._quarantined, ignore_index=True)
@@ -0,0 +1,19 @@
+import pytest
+
+from paypy_batch import duplicate_school_names, main
+from roster_generator import make_roster
+
+
+def test_duplicate_school_names():
+    paths = ["in/lincoln_roster.csv", "in/lincoln_data.csv", "in/adams.csv"]
+    assert duplicate_school_names(paths) == {"Lincoln": ["in/lincoln_roster.csv", "in/lincoln_data.csv"]}
+
+
+def test_rosters_of_one_school_are_refused(tmp_path, capsys):
+    for name in ["lincoln_roster.csv", "lincoln_data.csv"]:
+        make_roster(20).to_csv(tmp_path / name, index=False)
+    with pytest.raises(SystemExit) as exit_info:
+        main([str(tmp_path), "--output-dir", str(tmp_path / "reports")])
+    assert exit_info.value.code == 2
+    assert "Lincoln" in capsys.readouterr().err
+    assert not (tmp_path / "reports").exists()
@@ -0,0 +1,83 @@
+import pandas as pd
+import pytest
+
+from paypy_dedup import dedup_sections
+
+KEY = ["Year", "Organization", "Course Title", "Staff Name"]
+
+
+def _sections(rows, columns=("Course Title", "Staff Name", "Total Students")):
+    return pd.DataFrame(rows, columns=list(columns)).assign(Year=2025, Organization="Lincoln")[
+        ["Year", "Organization"] + list(columns)
+    ]
+
+
+def _repeated():
+    return _sections([
+        ["MUSIC 1", "Kim", 24],
+        ["ART 2", "Park", 20],
+        ["MUSIC 1", "Kim", 30],
+        ["MUSIC 1", "Kim", 27],
+    ])
+
+
+def _rows(sections):
+    return sections[["Course Title", "Staff Name", "Total Students"]].values.tolist()
+
+
+def test_first_keeps_the_first_row_of_each_section():
+    sections, summary = dedup_sections(_repeated(), "first")
+    assert _rows(sections) == [["MUSIC 1", "Kim", 24], ["ART 2", "Park", 20]]
+    assert summary.values.tolist() == [[2025, "Lincoln", "MUSIC 1", "Kim", 3, 81, 24]]
+    assert list(summary.columns) == KEY + ["Rows", "Students Listed", "Students Counted"]
+
+
+def test_max_keeps_the_row_with_the_most_students():
+    sections, summary = dedup_sections(_repeated(), "max")
+    assert _rows(sections) == [["ART 2", "Park", 20], ["MUSIC 1", "Kim", 30]]
+    assert summary.values.tolist() == [[2025, "Lincoln", "MUSIC 1", "Kim", 3, 81, 30]]
+
+
+def test_split_shares_a_section_across_co_teachers_by_section_id():
+    roster = _sections(
+        [
+            ["MUSIC 1", "Kim", "S1", 25],
+            ["MUSIC 1", "Lee", "S1", 25],
+            ["MUSIC 1", "Ortiz", "S1", 24],
+            ["MUSIC 1", "Kim", "S1", 20],
+            ["MUSIC 1", "Park", "S2", 30],
+        ],
+        columns=("Course Title", "Staff Name", "Section ID", "Total Students"),
+    )
+    sections, summary = dedup_sections(roster, "split")
+
+    # 25 students over three teachers: the remainder goes to the teacher listed first
+    assert _rows(sections) == [
+        ["MUSIC 1", "Kim", 9], ["MUSIC 1", "Lee", 8], ["MUSIC 1", "Ortiz", 8], ["MUSIC 1", "Park", 30],
+    ]
+    assert "Section ID" not in sections.columns
+    assert list(summary.columns) == [
+        "Year", "Organization", "Course Title", "Section ID", "Staff Name", "Rows", "Students Listed",
+        "Students Counted",
+    ]
+    assert summary.values.tolist() == [[2025, "Lincoln", "MUSIC 1", "S1", "Kim; Lee; Ortiz", 4, 94, 25]]
+
+
+def test_sections_listed_once_are_unchanged():
+    roster = _sections([["MUSIC 1", "Kim", 24], ["ART 2", "Park", 20]])
+    for policy in ("first", "max", "split"):
+        sections, summary = dedup_sections(roster, policy)
+        assert _rows(sections) == _rows(roster), policy
+        assert summary.empty, policy
+
+
+def test_split_needs_a_key_besides_staff_name():
+    with pytest.raises(ValueError, match="besides Staff Name"):
+        dedup_sections(_repeated(), "split", key=["Staff Name"])
+
+
+def test_unknown_policy_and_key_columns_are_rejected():
+    with pytest.raises(ValueError, match="Unknown de-duplication policy"):
+        dedup_sections(_repeated(), "sum")
+    with pytest.raises(ValueError, match="Unknown de-duplication key column"):
+        dedup_sections(_repeated(), "first", key=["Room"])
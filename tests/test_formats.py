@@ -0,0 +1,89 @@
+import io
+
+import openpyxl
+import pandas as pd
+import pyarrow as pa
+import pytest
+
+from paypy_core import OverloadPayCalculator, XLSX_MONEY_FORMAT, _roster_format
+from roster_generator import make_roster
+
+
+def _write_arrow_stream(roster, path):
+    table = pa.Table.from_pandas(roster, preserve_index=False)
+    with pa.OSFile(str(path), "wb") as sink, pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+
+# Writer, file name and the format the signature must be detected as; misnamed files are detected by content
+ROSTER_FILES = {
+    "csv": (lambda roster, path: roster.to_csv(path, index=False), "roster.csv", "csv"),
+    "gzip": (lambda roster, path: roster.to_csv(path, index=False, compression="gzip"), "roster.csv.gz", "csv.gz"),
+    "zip": (lambda roster, path: roster.to_csv(path, index=False, compression="zip"), "roster.zip", "csv.zip"),
+    "gzip misnamed": (
+        lambda roster, path: roster.to_csv(path, index=False, compression="gzip"), "roster.csv", "csv.gz"
+    ),
+    "xlsx": (lambda roster, path: roster.to_excel(path, index=False), "roster.xlsx", "xlsx"),
+    "xlsx misnamed": (lambda roster, path: roster.to_excel(path, index=False, engine="openpyxl"), "roster.zip", "xlsx"),
+    "parquet": (lambda roster, path: roster.to_parquet(path, index=False), "roster.parquet", "parquet"),
+    "arrow file": (lambda roster, path: roster.to_feather(path), "roster.feather", "arrow"),
+    "arrow stream": (_write_arrow_stream, "roster.arrows", "arrow"),
+}
+
+
+def _process(file, chunksize=None):
+    calculator = OverloadPayCalculator()
+    success, message = calculator.process_data(file, "Formats", 4, 1.25, False, chunksize=chunksize)
+    assert success, message
+    return calculator
+
+
+@pytest.mark.parametrize("kind", list(ROSTER_FILES))
+def test_every_format_gives_the_csv_totals(tmp_path, kind):
+    roster = make_roster(1500, seed=3)
+    expected = _process(io.StringIO(roster.to_csv(index=False)))
+    write, filename, roster_format = ROSTER_FILES[kind]
+    path = tmp_path / filename
+    write(roster, path)
+    with open(path, "rb") as f:
+        content = f.read()
+
+    assert _roster_format(str(path)) == roster_format
+    assert _roster_format(io.BytesIO(content)) == roster_format
+    for file, chunksize in [(str(path), None), (str(path), 97), (content, None), (content, 97)]:
+        # Uploads are unnamed in-memory files
+        calculator = _process(io.BytesIO(file) if isinstance(file, bytes) else file, chunksize)
+        assert calculator.grand_total == expected.grand_total, (file, chunksize)
+        pd.testing.assert_series_equal(
+            calculator.staff_totals["Overload Pay Cents"], expected.staff_totals["Overload Pay Cents"]
+        )
+
+
+def test_xlsx_export_is_laid_out_like_the_csv_export():
+    csv_text = (
+        "Year,Organization,Course Title,Staff Name,Total Students\n"
+        "2025,Lincoln,MUSIC 1,Kim,25\n"
+        "2025,Lincoln,ART 4,Kim,20\n"
+        "2025,Lincoln,ART 2,Park,30\n"
+        "2025,Lincoln,MATH 1,Park,40\n"
+    )
+    calculator = OverloadPayCalculator()
+    success, message = calculator.process_data(io.StringIO(csv_text), "Lincoln", 4, 1.25, False)
+    assert success, message
+    sheet = openpyxl.load_workbook(io.BytesIO(calculator.get_xlsx_report_bytes())).active
+
+    assert sheet.title == "Lincoln"
+    assert list(sheet.iter_rows(values_only=True)) == [
+        ("Year", "Organization", "Course Title", "Staff Name", "Total Students", "Base Students", "Total Overload",
+         "Overload Pay"),
+        (2025, "Lincoln", "MUSIC 1", "Kim", 25, 23, 2, 10),
+        (2025, "Lincoln", "ART 4", "Kim", 20, 26, 0, 0),
+        (None, None, "TOTAL", "Kim", None, None, 2, 10),
+        (None,) * 8,
+        (2025, "Lincoln", "ART 2", "Park", 30, 23, 7, 35),
+        (None, None, "TOTAL", "Park", None, None, 7, 35),
+    ]
+    pay_cells = [row[7] for row in sheet.iter_rows(min_row=2) if row[7].value is not None]
+    assert [cell.number_format for cell in pay_cells] == [XLSX_MONEY_FORMAT] * 5
+    assert [row[0].font.b for row in sheet.iter_rows()] == [True, False, False, False, False, False, False]
+    assert [cell.value for cell in pay_cells if cell.font.b] == [10, 35]
@@ -0,0 +1,19 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+from bench_import import HEAVY_MODULES, LIGHT_MODULES, REPO_DIR
+
+_PROBE = "import json, sys; import {module}; print(json.dumps([name for name in {heavy!r} if name in sys.modules]))"
+
+
+@pytest.mark.parametrize("module", LIGHT_MODULES)
+def test_import_does_not_load_heavy_modules(module):
+    # A fresh interpreter, so modules imported by other tests do not count
+    output = subprocess.run(
+        [sys.executable, "-c", _PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    assert json.loads(output) == []
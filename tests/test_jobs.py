@@ -0,0 +1,24 @@
+import json
+
+import pytest
+
+import paypy_metrics
+from paypy_jobs import JobQueue
+from roster_generator import make_roster_csv
+
+
+@pytest.mark.parametrize("backend", ["thread", "process"])
+def test_background_jobs_reach_the_metrics_hooks(tmp_path, monkeypatch, backend):
+    metrics_path = tmp_path / "metrics.jsonl"
+    monkeypatch.setenv("PAYPY_METRICS_JSONL", str(metrics_path))
+    monkeypatch.setattr(paypy_metrics, "_shared_hooks", {})
+    queue = JobQueue(backend, max_workers=1)
+    try:
+        job = queue.submit(make_roster_csv(500).encode(), "lincoln_roster.csv", school_name="Lincoln")
+        job._future.result(timeout=60)
+    finally:
+        queue.shutdown()
+
+    assert job.status == "done", job.error
+    runs = [json.loads(line) for line in metrics_path.read_text().splitlines()]
+    assert [(run["school"], run["event"]) for run in runs][:1] == [("Lincoln", "process")]
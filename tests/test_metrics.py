@@ -0,0 +1,24 @@
+import io
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from paypy_core import OverloadPayCalculator
+from roster_generator import make_roster_csv
+
+
+def test_concurrent_traced_runs_keep_their_peaks():
+    csv_texts = [make_roster_csv(3000, seed=seed) for seed in range(6)]
+
+    def run(csv_text):
+        calculator = OverloadPayCalculator(trace_memory=True)
+        success, message = calculator.process_data(io.StringIO(csv_text), "Traced", 4, 1.25, False, chunksize=500)
+        assert success, message
+        return calculator.metrics
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        runs = list(executor.map(run, csv_texts))
+
+    for metrics in runs:
+        assert all(stage.peak_bytes for stage in metrics.stages.values()), metrics.to_dict()
+    # The last run to finish stops the trace it shared with the others
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,180 @@
+"""Parity checks: the optimized paths must give exactly the results of the plain ones.
+
+- The vectorized engine against a row-by-row reference of the original calculator.
+- Streamed (chunked) processing against reading the whole roster.
+- Incremental recalculation against a full run on the same roster.
+- Scenario grids against separate process_data runs, to the cent.
+"""
+import io
+import re
+
+import pandas as pd
+import pytest
+
+from paypy_core import OverloadPayCalculator, load_snapshot
+from paypy_rules import CourseRuleSet
+from paypy_scenarios import DEFAULT_TIER, ScenarioGrid
+from reference_calculator import process_rows
+from roster_generator import make_roster
+
+WEEKS = 3
+PAY_RATE = 1.37
+
+
+def _roster(num_rows=3000, seed=7):
+    roster = make_roster(num_rows, seed=seed)
+    # Quoted commas and quotes in titles and names exercise the CSV writer
+    roster.loc[::17, "Course Title"] = 'ART, "fun" 4'
+    roster.loc[::29, "Staff Name"] = 'Solo, "Teacher"'
+    return roster
+
+
+def _csv(roster):
+    return roster.to_csv(index=False)
+
+
+def _process(csv_text, rules=None, weeks=WEEKS, pay_rate=PAY_RATE, show_only_nonzero=False, chunksize=None):
+    calculator = OverloadPayCalculator(rules)
+    success, message = calculator.process_data(
+        io.StringIO(csv_text), "Parity", weeks, pay_rate, show_only_nonzero, chunksize=chunksize
+    )
+    assert success, message
+    return calculator
+
+
+def _reference(roster, weeks=WEEKS, pay_rate=PAY_RATE):
+    """The original calculator's logic, one row at a time: returns (processed rows, staff totals)"""
+    return process_rows(roster, weeks, pay_rate)
+
+
+def _reference_csv(processed, staff_totals, show_only_nonzero=False):
+    """The original CSV export: course rows, a TOTAL row per staff member and a blank row between staff"""
+    export = processed[processed["Total Overload"] > 0] if show_only_nonzero else processed
+    export = export.assign(**{"Overload Pay": [f"${pay:.2f}" for pay in export["Overload Pay"]]})
+    totals = dict(zip(staff_totals["Staff Name"], zip(staff_totals["Total Overload"], staff_totals["Overload Pay"])))
+    blank = dict.fromkeys(export.columns, "")
+    rows = []
+    for position, (_, row) in enumerate(export.iterrows()):
+        if position and rows[-1]["Staff Name"] != row["Staff Name"]:
+            rows.append(_total_row(blank, rows[-1]["Staff Name"], totals))
+            rows.append(blank)
+        rows.append(row.to_dict())
+    if rows:
+        rows.append(_total_row(blank, rows[-1]["Staff Name"], totals))
+    return pd.DataFrame(rows).to_csv(index=False)
+
+
+def _total_row(blank, staff_name, totals):
+    total_overload, pay = totals[staff_name]
+    return dict(blank, **{
+        "Course Title": "TOTAL",
+        "Staff Name": staff_name,
+        "Total Overload": total_overload,
+        "Overload Pay": f"${pay:.2f}",
+    })
+
+
+def _plain(values):
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+def _html(calculator):
+    # The report is stamped with the time it was generated
+    return re.sub(r"\d{4}-\d\d-\d\d at [\d:]+", "", calculator.get_html_report_bytes().decode())
+
+
+@pytest.mark.parametrize("show_only_nonzero", [False, True])
+def test_engine_matches_the_row_by_row_reference(show_only_nonzero):
+    roster = _roster()
+    calculator = _process(_csv(roster), show_only_nonzero=show_only_nonzero)
+    processed, staff_totals = _reference(roster)
+
+    rows = calculator.processed_df
+    assert list(rows.columns) == list(processed.columns[:-1]) + ["Overload Pay Cents"]
+    for column in processed.columns[:-1]:
+        assert _plain(rows[column]) == _plain(processed[column]), column
+    assert rows["Overload Pay Cents"].tolist() == [round(pay * 100) for pay in processed["Overload Pay"]]
+    assert calculator.staff_totals["Overload Pay Cents"].tolist() == [
+        round(pay * 100) for pay in staff_totals["Overload Pay"]
+    ]
+    assert calculator.grand_total["overload_pay"] == round(staff_totals["Overload Pay"].sum(), 2)
+    assert calculator.get_csv_report_bytes().decode() == _reference_csv(processed, staff_totals, show_only_nonzero)
+
+
+@pytest.mark.parametrize("chunksize", [97, 333, 100_000])
+def test_streamed_matches_in_memory(chunksize):
+    csv_text = _csv(_roster())
+    whole = _process(csv_text)
+    streamed = _process(csv_text, chunksize=chunksize)
+
+    pd.testing.assert_frame_equal(streamed.processed_df, whole.processed_df)
+    pd.testing.assert_frame_equal(streamed.staff_totals, whole.staff_totals)
+    assert streamed.grand_total == whole.grand_total
+    assert streamed.get_csv_report_bytes() == whole.get_csv_report_bytes()
+    assert _html(streamed) == _html(whole)
+
+
+def _with_year(roster, year):
+    # None drops the Year column; the section key must still match across periods read as other types
+    return roster.drop(columns="Year") if year is None else roster.assign(Year=year)
+
+
+@pytest.mark.parametrize("weeks, pay_rate, years", [
+    (WEEKS, PAY_RATE, (2025, 2025)),
+    (WEEKS + 1, PAY_RATE, (2025, 2025)),
+    (WEEKS, PAY_RATE, (None, 2025)),
+    (WEEKS, PAY_RATE, (2025, "2024-25")),
+    (WEEKS, PAY_RATE, ("2025", 2025)),
+])
+def test_incremental_matches_full(tmp_path, weeks, pay_rate, years):
+    roster = _roster()
+    # Repeated section keys are matched to the previous period in file order
+    roster = _with_year(pd.concat([roster, roster.iloc[:50]], ignore_index=True), years[0])
+    first = OverloadPayCalculator()
+    success, message = first.process_data_incremental(
+        io.StringIO(_csv(roster)), None, "Parity", WEEKS, PAY_RATE, False
+    )
+    assert success, message
+    first.save_snapshot(str(tmp_path / "snapshot.pkl"))
+
+    # Next period: changed counts, removed sections and new ones
+    changed = _with_year(roster, years[1])
+    changed.loc[100:140, "Total Students"] += 7
+    changed = pd.concat(
+        [changed.drop(changed.index[500:510]), _with_year(make_roster(30, seed=99), years[1])], ignore_index=True
+    )
+    csv_text = _csv(changed)
+
+    incremental = OverloadPayCalculator()
+    success, message = incremental.process_data_incremental(
+        io.StringIO(csv_text), load_snapshot(str(tmp_path / "snapshot.pkl")), "Parity", weeks, pay_rate, False
+    )
+    assert success, message
+    full = _process(csv_text, weeks=weeks, pay_rate=pay_rate)
+
+    pd.testing.assert_frame_equal(incremental.processed_df, full.processed_df)
+    pd.testing.assert_frame_equal(incremental.staff_totals, full.staff_totals)
+    assert incremental.grand_total == full.grand_total
+    assert incremental.get_csv_report_bytes() == full.get_csv_report_bytes()
+
+
+def test_scenarios_match_process_data_to_the_cent():
+    csv_text = _csv(_roster(2000))
+    calculator = _process(csv_text)
+    grid = ScenarioGrid.with_offsets(calculator.rules, [1.25, 1.333, 0.37], [1, 4, 18], [-2, 0, 1])
+    result = grid.evaluate(calculator)
+    staff_pay = result.staff_pay.set_index("Staff Name")
+
+    for scenario in result.scenarios.to_dict("records"):
+        rules = calculator.rules.to_dict()
+        overrides = grid.thresholds[scenario["Thresholds"]]
+        for rule in rules["thresholds"]:
+            rule["base_students"] = overrides[rule["label"]]
+        rules["default_base_students"] = overrides[DEFAULT_TIER]
+        run = _process(csv_text, CourseRuleSet.from_dict("scenario", rules), scenario["Weeks"], scenario["Pay Rate"])
+
+        name = scenario["Scenario"]
+        assert scenario["Overload Pay Cents"] == run.grand_total["overload_pay_cents"], name
+        assert scenario["Total Overload"] == run.grand_total["total_overload"], name
+        expected = run.staff_totals.set_index(run.staff_totals["Staff Name"].astype(object))["Overload Pay Cents"]
+        assert staff_pay[name].reindex(expected.index).tolist() == expected.tolist(), name
@@ -0,0 +1,28 @@
+import pandas as pd
+import pytest
+
+from paypy_rollup import DIMENSIONS, MEASURES, Rollup
+
+
+def _history(periods):
+    return Rollup.from_partials(pd.DataFrame([
+        dict(zip(DIMENSIONS, [period, "Lincoln", "North", "Kim, Ana", "MUSIC"]), **dict.fromkeys(MEASURES, 1))
+        for period in periods
+    ]))
+
+
+def test_year_to_date_starts_at_the_calendar_year_of_the_period():
+    history = _history(["2024-09", "2024-12", "2025-01", "2025-02"])
+    totals = history.year_to_date("2025-02")
+    assert int(totals["Sections"].iloc[0]) == 2
+
+
+def test_year_to_date_from_the_start_of_a_school_year():
+    history = _history(["2024-06", "2024-09", "2024-12", "2025-01", "2025-02"])
+    totals = history.year_to_date("2025-01", "Staff Name", since="2024-09")
+    assert totals["Sections"].tolist() == [3]
+
+
+def test_year_to_date_needs_a_start_for_unrecognized_labels():
+    with pytest.raises(ValueError):
+        _history(["Fall"]).year_to_date("Fall")
@@ -0,0 +1,53 @@
+import io
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("pyarrow")
+
+from paypy_core import OverloadPayCalculator
+from paypy_store import ResultStore
+
+
+def _processed(csv_text, school):
+    calculator = OverloadPayCalculator()
+    success, message = calculator.process_data(io.StringIO(csv_text), school, 4, 1.25, False)
+    assert success, message
+    return calculator
+
+
+def test_periods_with_different_column_types_read_back_together(tmp_path):
+    # A small roster without a Year column compacts to int8 counts and a blank categorical Year; the large
+    # one to wider integers and a numeric Year
+    small = _processed(
+        "Organization,Course Title,Staff Name,Total Students\n"
+        "North,MUSIC 1,\"Kim, Ana\",24\n"
+        "North,ART 4,\"Park, Lee\",27\n",
+        "Lincoln",
+    )
+    large = _processed(
+        "Year,Organization,Course Title,Staff Name,Total Students\n"
+        "2025,North,MUSIC 1,\"Kim, Ana\",300\n"
+        "2025,North,ART 4,\"Park, Lee\",1000\n",
+        "Lincoln",
+    )
+    assert small.processed_df["Total Students"].dtype != large.processed_df["Total Students"].dtype
+
+    store = ResultStore(str(tmp_path))
+    store.write(small, "Lincoln", "2025-01")
+    store.write(large, "Lincoln", "2025-02")
+
+    rows = store.read_rows()
+    assert len(rows) == 4
+    assert sorted(rows["Total Students"].tolist()) == [24, 27, 300, 1000]
+    assert set(rows["Year"].fillna("").tolist()) == {"", "2025"}
+
+    totals = store.read_staff_totals()
+    expected = small.grand_total["overload_pay_cents"] + large.grand_total["overload_pay_cents"]
+    assert int(totals["Overload Pay Cents"].sum()) == expected
+
+    rollup = store.read_rollup().by("Period")
+    assert rollup["Overload Pay Cents"].tolist() == [
+        small.grand_total["overload_pay_cents"], large.grand_total["overload_pay_cents"]
+    ]
+    assert pd.api.types.is_integer_dtype(rows["Overload Pay Cents"].dtype)
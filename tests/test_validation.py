@@ -0,0 +1,36 @@
+import pandas as pd
+
+from paypy_validation import RosterValidator
+
+
+def _chunk(rows):
+    return pd.DataFrame(rows, columns=["Course Title", "Staff Name", "Total Students"])
+
+
+def _duplicate_rows(validator):
+    errors = validator.errors()
+    return errors.loc[errors["Severity"] == "warning", "Row"].tolist()
+
+
+def test_duplicates_are_found_across_chunks():
+    validator = RosterValidator()
+    validator.validate(_chunk([["MUSIC 1", "Kim", 24], ["ART 2", "Park", 20]]))
+    validator.validate(_chunk([["ART 2", "Park", 20], ["ART 2", "Park", 20], ["ART 3", "Park", 20]]))
+    assert _duplicate_rows(validator) == [3, 4]
+
+
+def test_duplicate_mask_limits_the_rows_checked():
+    validator = RosterValidator(duplicate_mask=lambda chunk: chunk["Course Title"].str.startswith("MUSIC"))
+    validator.validate(_chunk([["MATH 1", "Kim", 24], ["MATH 1", "Kim", 24], ["MUSIC 1", "Kim", 24]]))
+    validator.validate(_chunk([["MUSIC 1", "Kim", 24]]))
+    assert _duplicate_rows(validator) == [4]
+
+
+def test_counts_too_large_for_a_class_are_quarantined():
+    validator = RosterValidator()
+    chunk = validator.validate(_chunk([["MUSIC 1", "Kim", 1e30], ["ART 2", "Park", "20001"], ["ART 3", "Park", 30]]))
+    assert chunk["Total Students"].tolist() == [30]
+    errors = validator.errors()
+    assert errors["Row"].tolist() == [1, 2]
+    assert errors["Problem"].tolist() == ["Total Students is out of range (over 10,000)"] * 2
+    assert validator.quarantined()["Row"].tolist() == [1, 2]